@@ -1,36 +1,200 @@
 import asyncio
+import atexit
+import glob
 import os
 import json
 import logging
-from fastapi import FastAPI
-import uvicorn
+import shlex
+import time
+from email.utils import getaddresses
 from dotenv import load_dotenv
 
+load_dotenv()
+
+# prometheus_client picks in-memory or file-backed samples when it is imported, so the service
+# sets the directory before `import metrics` and clears what its previous run left there
+if __name__ == "__main__":
+    _metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", ".cache/prometheus")
+    os.makedirs(_metrics_dir, exist_ok=True)
+    for _stale in glob.glob(os.path.join(_metrics_dir, "*.db")):
+        os.remove(_stale)
+
+import health_server
+import load
+import metrics
+
+# Run as the service, bind the health port before the heavy imports below (livekit, plugins and
+# mem0 take seconds): the platform restarts containers whose port stays closed for too long.
+# A load report left by the previous run would read as a stale heartbeat, and if anything below
+# fails the server goes down with this process instead of reporting a dead agent online
+_health_process = None
+if __name__ == "__main__":
+    if os.path.exists(load.LOAD_REPORT_PATH):
+        os.remove(load.LOAD_REPORT_PATH)
+    _health_process = health_server.spawn()
+    atexit.register(_health_process.terminate)
+
 from livekit import agents
-from livekit.agents import AgentSession, Agent, RoomInputOptions, ChatContext, llm
+from livekit.agents import AgentSession, Agent, RoomInputOptions, ChatContext, RunContext, function_tool, llm
 # This is the precise path for the Worker class in your version
 from livekit.agents.worker import Worker 
 from livekit.plugins import noise_cancellation, google
+from google.genai import types as genai_types
 
 from prompts import AGENT_INSTRUCTION, SESSION_INSTRUCTION
-from tools import get_weather, search_web, mobile_whatsapp, mobile_discord 
-from mem0 import AsyncMemoryClient
-from mcp_client import MCPServerSse
-from mcp_client.agent_tools import MCPToolsIntegration
+from tools import ASSISTANT_TOOLS, outreach_store, OUTREACH_GOAL
+from mcp_client import MCPServerSse, MCPServerStdio, MCPServerPool, ToolSchemaStore, CallGuard
+from mcp_client.agent_tools import MCPToolsIntegration, timing_hooks as mcp_timing_hooks, result_hooks as mcp_result_hooks
+import http_client
+import cache
+import loop_watchdog
+from memory import MemoryIndex, MemorySnapshot
+from journal import ConversationJournal
+from startup import session_graph
 
-load_dotenv()
+# Memory injected at session start: the best MEMORY_TOP_K for the seed query within MEMORY_TOKEN_BUDGET.
+# Everything else stays reachable through the recall_memories tool.
+MEMORY_SEED_QUERY = os.environ.get("MEMORY_SEED_QUERY", "school outreach email list 100-school goal progress")
+MEMORY_TOP_K = int(os.environ.get("MEMORY_TOP_K", 20))
+MEMORY_TOKEN_BUDGET = int(os.environ.get("MEMORY_TOKEN_BUDGET", 800))
+MEMORY_RECALL_TOKEN_BUDGET = int(os.environ.get("MEMORY_RECALL_TOKEN_BUDGET", 400))
+MEMORY_SNAPSHOT_DIR = os.environ.get("MEMORY_SNAPSHOT_DIR", ".cache/memory")
+JOURNAL_PATH = os.environ.get("JOURNAL_PATH", ".cache/journal.sqlite3")
+# Uploaded turns are pruned from the journal once they are this old
+JOURNAL_RETENTION_DAYS = float(os.environ.get("JOURNAL_RETENTION_DAYS", 7))
+
+# Deadline for each MCP server to connect and list its tools; slow servers only lose their own tools
+MCP_SERVER_TIMEOUT = float(os.environ.get("MCP_SERVER_TIMEOUT", 10))
+
+# One guard for every pooled n8n session: call limits, deadlines and a circuit breaker so a
+# voice turn never waits on a hung workflow. MCP_TOOL_LIMITS takes per-tool JSON overrides.
+MCP_CALL_GUARD = CallGuard(
+    "Jarvis-Outreach-Link",
+    max_concurrency=int(os.environ.get("MCP_MAX_CONCURRENCY", 8)),
+    tool_concurrency=int(os.environ.get("MCP_TOOL_CONCURRENCY", 0)) or None,
+    call_timeout=float(os.environ.get("MCP_CALL_TIMEOUT", 15)),
+    tool_limits=json.loads(os.environ.get("MCP_TOOL_LIMITS", "{}")),
+    failure_threshold=int(os.environ.get("MCP_BREAKER_FAILURES", 5)),
+    recovery_timeout=float(os.environ.get("MCP_BREAKER_RECOVERY", 30)),
+)
+
+# Jobs run in prewarmed processes ("process"), or as threads sharing one process ("thread").
+# WORKER_IDLE_PROCESSES processes are kept warm, one per core by default.
+WORKER_EXECUTOR = os.environ.get("WORKER_EXECUTOR", "process")
+WORKER_IDLE_PROCESSES = int(os.environ.get("WORKER_IDLE_PROCESSES", os.cpu_count() or 1))
+
+# The MCP pools below are per process, connected in prewarm(). Only the thread executor shares
+# them between jobs; a job process serves one room and exits with it, so there each pool is a
+# pre-connect for that room and keeps one session (n8n sees one connection per warm process).
+# MCP_POOL_SIZE and MCP_STDIO_POOL_SIZE apply to the thread executor.
+def _pool_size(name: str) -> int:
+    return int(os.environ.get(name, 1)) if WORKER_EXECUTOR == "thread" else 1
+
+# Live n8n MCP sessions, warmed in prewarm()
+MCP_POOL = MCPServerPool(
+    lambda: MCPServerSse(
+        params={"url": os.environ.get("N8N_MCP_SERVER_URL")}, cache_tools_list=True, name="Jarvis-Outreach-Link",
+        tools_store=ToolSchemaStore(os.environ.get("MCP_TOOLS_CACHE_DIR", ".cache/mcp-tools")),
+        call_guard=MCP_CALL_GUARD,
+    ),
+    size=_pool_size("MCP_POOL_SIZE"),
+    health_check_interval=float(os.environ.get("MCP_POOL_HEALTH_INTERVAL", 30)),
+)
+
+# Optional local tool server (e.g. "npx -y @modelcontextprotocol/server-filesystem /data"), kept
+# running as a pool of subprocesses so jobs skip the spawn and initialize handshake
+MCP_STDIO_COMMAND = shlex.split(os.environ.get("MCP_STDIO_COMMAND", ""))
+MCP_STDIO_POOL = MCPServerPool(
+    lambda: MCPServerStdio(
+        params={"command": MCP_STDIO_COMMAND[0], "args": MCP_STDIO_COMMAND[1:]}, cache_tools_list=True,
+        name="Jarvis-Local-Tools",
+        tools_store=ToolSchemaStore(os.environ.get("MCP_TOOLS_CACHE_DIR", ".cache/mcp-tools")),
+        call_guard=CallGuard(
+            "Jarvis-Local-Tools",
+            max_concurrency=int(os.environ.get("MCP_STDIO_MAX_CONCURRENCY", 4)),
+            call_timeout=float(os.environ.get("MCP_CALL_TIMEOUT", 15)),
+            max_queue=int(os.environ.get("MCP_STDIO_MAX_QUEUE", 16)),
+        ),
+    ),
+    size=_pool_size("MCP_STDIO_POOL_SIZE"),
+    health_check_interval=float(os.environ.get("MCP_POOL_HEALTH_INTERVAL", 30)),
+) if MCP_STDIO_COMMAND else None
+
+def _record_mcp_timing(event: str, name: str, seconds: float, ok: bool):
+    if event == "call_started":
+        metrics.PENDING_TOOL_CALLS.inc()
+    elif event == "call":
+        metrics.PENDING_TOOL_CALLS.dec()
+        metrics.observe_tool(name, "mcp", seconds, ok)
+    elif event == "rejected":
+        metrics.TOOL_CALL_SECONDS.labels(name, "mcp", "rejected").observe(seconds)
+    else:
+        metrics.observe_phase(f"mcp_{event}", seconds)
+
+mcp_timing_hooks.append(_record_mcp_timing)
+
+# Emails sent through these MCP tools are recorded in the outreach store, from the recipient
+# ("to", "email", "recipient" or "recipients") and "subject" arguments
+OUTREACH_EMAIL_TOOLS = set(os.environ.get("OUTREACH_EMAIL_TOOLS", "send_email").split(","))
+_outreach_writes = set()
+
+def _record_outreach_send(tool: str, arguments: dict, result: str, ok: bool):
+    if tool not in OUTREACH_EMAIL_TOOLS:
+        return
+    recipients = next((arguments[k] for k in ("to", "email", "recipient", "recipients") if arguments.get(k)), None)
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    # Display names may hold commas ("Doe, Jane" <jane@school.org>); getaddresses also takes ; lists
+    recipients = [address for _, address in getaddresses([str(r) for r in recipients or ()]) if address]
+    if not recipients:
+        return
+    write = asyncio.create_task(
+        asyncio.to_thread(outreach_store().record_send, recipients, arguments.get("subject"), ok)
+    )
+    _outreach_writes.add(write)
+    write.add_done_callback(_outreach_writes.discard)
+
+mcp_result_hooks.append(_record_outreach_send)
+
+# Job admission: the worker stops taking jobs once any signal reaches WORKER_LOAD_THRESHOLD of its
+# limit (sessions, event loop lag in seconds, CPU as a fraction, tool calls in flight). /load shows it.
+WORKER_LOAD = load.LoadMonitor(
+    max_sessions=int(os.environ.get("WORKER_MAX_SESSIONS", 2 * (os.cpu_count() or 1))),
+    max_loop_lag=float(os.environ.get("WORKER_MAX_LOOP_LAG", 0.1)),
+    max_cpu=float(os.environ.get("WORKER_MAX_CPU", 0.9)),
+    max_pending_calls=int(os.environ.get("WORKER_MAX_PENDING_CALLS", 32)),
+    threshold=float(os.environ.get("WORKER_LOAD_THRESHOLD", 0.8)),
+)
+
+# Opt-in: catch calls that block the event loop (and so every room's audio) for longer than
+# LOOP_WATCHDOG_THRESHOLD seconds, and log the worst offenders with stacks when each session ends
+LOOP_WATCHDOG = os.environ.get("LOOP_WATCHDOG", "").lower() in ("1", "true", "yes")
+LOOP_WATCHDOG_THRESHOLD = float(os.environ.get("LOOP_WATCHDOG_THRESHOLD", 0.1))
+
+# Session startup stages that can fall back: without a mem0 client the session runs on the local
+# snapshot and journal, and a memory snapshot that won't load leaves the vault to recall_memories
+STARTUP_MEM0_CLIENT_TIMEOUT = float(os.environ.get("STARTUP_MEM0_CLIENT_TIMEOUT", 5))
+STARTUP_MEMORY_TIMEOUT = float(os.environ.get("STARTUP_MEMORY_TIMEOUT", 3))
 
-# --- PART 1: THE WEB SERVER ---
-app = FastAPI()
+# Long sessions: Gemini Live keeps the conversation server-side (and resumes it on reconnect), so
+# its context is bounded by Gemini's own sliding window: past GEMINI_CONTEXT_TRIGGER_TOKENS it is
+# cut to GEMINI_CONTEXT_TARGET_TOKENS. Turns can't be dropped from a live session from this side.
+GEMINI_CONTEXT_TRIGGER_TOKENS = int(os.environ.get("GEMINI_CONTEXT_TRIGGER_TOKENS", 25600))
+GEMINI_CONTEXT_TARGET_TOKENS = int(os.environ.get("GEMINI_CONTEXT_TARGET_TOKENS", 12800))
 
-@app.get("/healthz")
-async def health_check():
-    """Render and cron-job.org heartbeat."""
-    return {"status": "online", "agent": "Jarvis"}
+def _memory_client():
+    # Imported on first use; only job processes need mem0 and it is slow to import
+    from mem0 import AsyncMemoryClient
+    return AsyncMemoryClient()
+
+# --- PART 1: THE WEB SERVER lives in health_server.py, in its own process ---
 
 # --- PART 2: THE ASSISTANT ---
 class Assistant(Agent):
-    def __init__(self, chat_ctx=None) -> None:
+    def __init__(self, chat_ctx=None, memory_index: MemoryIndex = None, injected_memory_ids=()) -> None:
+        self.memory_index = memory_index or MemoryIndex([])
+        # Memories already in the pinned context; recall_memories spends its budget on the rest
+        self.injected_memory_ids = set(injected_memory_ids)
         jarvis_persona = (
             f"{AGENT_INSTRUCTION}\n\n"
             "SCHOOL OUTREACH PROTOCOL: Authorized to search for school contact info. "
@@ -43,54 +207,140 @@ class Assistant(Agent):
             llm=google.beta.realtime.RealtimeModel(
                  voice="Charon",
                  temperature=0.4, 
+                 context_window_compression=genai_types.ContextWindowCompressionConfig(
+                     trigger_tokens=GEMINI_CONTEXT_TRIGGER_TOKENS,
+                     sliding_window=genai_types.SlidingWindow(target_tokens=GEMINI_CONTEXT_TARGET_TOKENS),
+                 ),
             ),
-            tools=[get_weather, search_web, mobile_whatsapp, mobile_discord],
+            tools=list(ASSISTANT_TOOLS),
             chat_ctx=chat_ctx
         )
 
+    @function_tool()
+    async def recall_memories(self, context: RunContext, query: str) -> str:
+        """Search Ivan's memory vault for details that aren't already in the conversation."""
+        return self.memory_index.recall(query, k=MEMORY_TOP_K, token_budget=MEMORY_RECALL_TOKEN_BUDGET,
+                                        exclude_ids=self.injected_memory_ids)
+
 async def entrypoint(ctx: agents.JobContext):
-    async def shutdown_hook(chat_ctx: ChatContext, mem0: AsyncMemoryClient):
-        logging.info("Archiving session data...")
-        messages_formatted = []
-        recent_items = chat_ctx.items[-10:] if chat_ctx.items else []
-        for item in recent_items:
-            if not isinstance(item, llm.ChatMessage): continue
-            content_str = ''.join(item.content) if isinstance(item.content, list) else str(item.content)
-            if item.role in ['user', 'assistant']:
-                messages_formatted.append({"role": item.role, "content": content_str.strip()})
-        if messages_formatted:
-            try: await asyncio.wait_for(mem0.add(messages_formatted, user_id="Ivan"), timeout=5.0)
-            except Exception as e: logging.error(f"Memory sync failed: {e}")
+    started = time.perf_counter()
+    metrics.ACTIVE_SESSIONS.inc()
+    load.ensure_lag_probe()
+    if LOOP_WATCHDOG:
+        loop_watchdog.ensure_watchdog(LOOP_WATCHDOG_THRESHOLD)
+
+    async def _session_ended():
+        metrics.ACTIVE_SESSIONS.dec()
+        if LOOP_WATCHDOG:
+            loop_watchdog.log_worst_offenders()
 
+    ctx.add_shutdown_callback(_session_ended)
     session = AgentSession()
-    mem0 = AsyncMemoryClient()
-    
-    # Load Memory
-    results = await mem0.get_all(user_id='Ivan')
-    initial_ctx = ChatContext()
-    if results:
-        initial_ctx.add_message(role="assistant", content=f"Vault Synchronized: {json.dumps([m['memory'] for m in results])}")
 
-    # MCP Setup
-    mcp_server = MCPServerSse(params={"url": os.environ.get("N8N_MCP_SERVER_URL")}, cache_tools_list=True, name="Jarvis-Outreach-Link")
+    # Archive every turn as it happens. Turns are journaled locally from the start; uploads to
+    # mem0 (in retried batches, replaying whatever an earlier session left pending) begin once the
+    # client is ready
+    journal = ConversationJournal(JOURNAL_PATH, None, user_id="Ivan", session_id=ctx.room.name,
+                                  retention=JOURNAL_RETENTION_DAYS * 86400)
+    ctx.add_shutdown_callback(journal.close)
+    ctx.add_shutdown_callback(http_client.close)
+    ctx.add_shutdown_callback(cache.log_stats)
 
-    try:
-        agent = await asyncio.wait_for(
-            MCPToolsIntegration.create_agent_with_tools(
-                agent_class=Assistant, agent_kwargs={"chat_ctx": initial_ctx}, mcp_servers=[mcp_server]
-            ), timeout=20.0 
+    @session.on("conversation_item_added")
+    def _journal_turn(ev):
+        item = ev.item
+        if not isinstance(item, llm.ChatMessage) or item.role not in ['user', 'assistant']: return
+        content_str = ''.join(c for c in item.content if isinstance(c, str)) if isinstance(item.content, list) else str(item.content)
+        journal.append_nowait(item.role, content_str)
+
+    snapshot = MemorySnapshot(MEMORY_SNAPSHOT_DIR, user_id='Ivan')
+    # MCP Setup: lease already-initialized sessions instead of handshaking per room
+    mcp_servers = [pool.server() for pool in (MCP_POOL, MCP_STDIO_POOL) if pool is not None]
+    for mcp_server in mcp_servers:
+        ctx.add_shutdown_callback(mcp_server.cleanup)
+
+    # Startup runs as a graph: the room connects while memory loads and the mem0 client is
+    # built, tools are discovered while the session starts, and the greeting waits only for
+    # the session and the room
+
+    async def mem0_client():
+        # The client validates its API key with a blocking request, so prefer the one prewarm() built
+        return ctx.proc.userdata.pop("mem0", None) or await asyncio.to_thread(_memory_client)
+
+    async def journal_upload(mem0):
+        if mem0 is not None:
+            journal.client = mem0
+            journal.start()
+
+    async def load_memory():
+        # Only what's relevant and fits the budget is injected; recall_memories reaches the rest
+        return MemoryIndex(await asyncio.to_thread(snapshot.load))
+
+    async def build_agent(memory_index):
+        selected = memory_index.select(MEMORY_SEED_QUERY, k=MEMORY_TOP_K, token_budget=MEMORY_TOKEN_BUDGET)
+        initial_ctx = ChatContext()
+        if selected:
+            initial_ctx.add_message(role="assistant", content=f"Vault Synchronized: {json.dumps([m['memory'] for m in selected])}")
+        # Start with the local tools only; MCP tools are hot-attached as each server delivers them
+        return Assistant(chat_ctx=initial_ctx, memory_index=memory_index,
+                         injected_memory_ids=[m["id"] for m in selected if m.get("id") is not None])
+
+    async def sync_memory(mem0, agent):
+        # Delta-sync the snapshot from mem0 in the background; recall_memories sees the result
+        async def sync():
+            try:
+                if await snapshot.sync(mem0):
+                    agent.memory_index = MemoryIndex(snapshot.load())
+            except Exception as e:
+                logging.error(f"Memory snapshot sync failed: {e}")
+
+        if mem0 is not None:
+            return asyncio.create_task(sync())
+
+    async def attach_mcp_tools(agent):
+        await MCPToolsIntegration.attach_tools_in_background(agent, mcp_servers, server_timeout=MCP_SERVER_TIMEOUT)
+
+    async def start_session(agent):
+        await session.start(
+            room=ctx.room,
+            agent=agent,
+            room_input_options=RoomInputOptions(video_enabled=True, noise_cancellation=noise_cancellation.BVC()),
         )
-    except:
-        agent = Assistant(chat_ctx=initial_ctx)
 
-    await session.start(
-        room=ctx.room,
-        agent=agent,
-        room_input_options=RoomInputOptions(video_enabled=True, noise_cancellation=noise_cancellation.BVC()),
+    async def goal_status():
+        return await asyncio.to_thread(outreach_store().goal_status, OUTREACH_GOAL)
+
+    async def greet(_session, _room, status):
+        outreach = f"\nOutreach status: {json.dumps(status)}" if status else ""
+        await session.generate_reply(
+            instructions=f"{SESSION_INSTRUCTION}{outreach}\nGreet Ivan and ask about the school email list."
+        )
+        metrics.observe_phase("total", time.perf_counter() - started)
+
+    startup = session_graph(
+        {
+            "mem0_client": mem0_client, "journal_upload": journal_upload, "mem0_load": load_memory,
+            "build_agent": build_agent, "memory_sync": sync_memory, "mcp_tools_attached": attach_mcp_tools,
+            "session_start": start_session, "ctx_connect": ctx.connect, "goal_status": goal_status,
+            "first_reply": greet,
+        },
+        mem0_client_timeout=STARTUP_MEM0_CLIENT_TIMEOUT,
+        memory_timeout=STARTUP_MEMORY_TIMEOUT,
+        memory_fallback=lambda: MemoryIndex([]),
     )
-    await ctx.connect()
-    await session.generate_reply(instructions=f"{SESSION_INSTRUCTION}\nGreet Ivan and ask about the school email list.")
-    ctx.add_shutdown_callback(lambda: shutdown_hook(session._agent.chat_ctx, mem0))
+    await startup.run()
+
+def prewarm(proc: agents.JobProcess):
+    """Runs once per worker process before it takes jobs: open the MCP sessions and build the heavy clients early."""
+    MCP_POOL.start()
+    if MCP_STDIO_POOL is not None:
+        MCP_STDIO_POOL.start()
+    # A process runs one job at a time only with the process executor; threads build their own client
+    if WORKER_EXECUTOR == "process":
+        try:
+            proc.userdata["mem0"] = _memory_client()
+        except Exception as e:
+            logging.warning(f"Could not prewarm the mem0 client, jobs will create their own: {e}")
 
 # --- PART 3: THE DUAL-RUNNER ---
 async def main():
@@ -98,19 +348,36 @@ async def main():
     port = int(os.environ.get("PORT", 8080))
     
     # 1. Initialize the LiveKit Worker from the submodule
-    options = agents.WorkerOptions(entrypoint_fnc=entrypoint)
+    executor = agents.JobExecutorType.THREAD if WORKER_EXECUTOR == "thread" else agents.JobExecutorType.PROCESS
+    options = agents.WorkerOptions(
+        entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
+        job_executor_type=executor,
+        num_idle_processes=WORKER_IDLE_PROCESSES,
+        # Job processes write their metrics below the service's, so /metrics on the health server sees them all
+        prometheus_multiproc_dir=metrics.JOBS_DIR,
+        load_fnc=WORKER_LOAD,
+        load_threshold=WORKER_LOAD.threshold,
+    )
     worker = Worker(options)
+    # /readyz goes true once the worker's next load report after registering is written
+    worker.on("worker_registered", WORKER_LOAD.mark_registered)
     
-    # 2. Setup the FastAPI Server config
-    config = uvicorn.Config(app, host="0.0.0.0", port=port, log_level="info")
-    server = uvicorn.Server(config)
+    # 2. The FastAPI server runs in its own process, so a busy worker can't delay /healthz;
+    # it was started before the heavy imports when running as the service
+    health = asyncio.create_task(health_server.supervise(_health_process))
+    # The worker's own loop handles every job's IPC; with the thread executor it runs the jobs too
+    load.ensure_lag_probe()
+    if LOOP_WATCHDOG:
+        loop_watchdog.ensure_watchdog(LOOP_WATCHDOG_THRESHOLD)
     
-    # 3. Run both concurrently
+    # 3. Run the worker until it stops, then take the health server down with it
     logging.info(f"Jarvis Protocol initiating on port {port}...")
-    await asyncio.gather(
-        worker.run(),
-        server.serve()
-    )
+    try:
+        await worker.run()
+    finally:
+        health.cancel()
+        await asyncio.gather(health, return_exceptions=True)
 
 if __name__ == "__main__":
     try:
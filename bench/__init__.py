@@ -0,0 +1 @@
+"""Offline benchmark harness: local stand-ins for MCP, mem0 and Tavily/wttr.in plus a room simulator."""
@@ -0,0 +1,134 @@
+"""
+Import-time profile of the agent and how soon /healthz answers on a cold start.
+
+    python -m bench.import_profile --module agent --top 15 --output import_profile.json
+
+Imports the module in a fresh interpreter under `python -X importtime` and
+reports the slowest imports it triggers, grouped by top-level package. Then it
+times two real cold starts until /healthz first answers: `python agent.py`,
+which binds the port before the heavy imports (`healthz_ready_seconds`), and
+the old order, importing the agent and only then starting the health server
+(`healthz_ready_seconds_bound_after_imports`).
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Any, Dict, List
+
+from bench.standins import _free_port
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def profile_imports(module: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=_ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    top_level: List[Dict[str, Any]] = []
+    children: List[Dict[str, Any]] = []
+    total_us = 0
+    errors = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match is None:
+            if not line.startswith("import time:"):
+                errors.append(line)
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        # Nesting is shown by indentation and a module is listed after its imports, so the
+        # direct imports of the profiled module are the level-1 entries right before it
+        depth = len(indent) // 2
+        if depth == 1:
+            children.append({"module": name, "cumulative_seconds": int(cumulative_us) / 1e6,
+                             "self_seconds": int(self_us) / 1e6})
+        elif depth == 0:
+            if name == module:
+                top_level, total_us = children, int(cumulative_us)
+            children = []
+    if not top_level and children:
+        # The import failed part-way, so the module itself was never listed
+        top_level = children
+        total_us = int(sum(e["cumulative_seconds"] for e in children) * 1e6)
+    packages: Dict[str, float] = {}
+    for entry in top_level:
+        root = entry["module"].split(".")[0]
+        packages[root] = packages.get(root, 0.0) + entry["cumulative_seconds"]
+    return {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "error": "\n".join(errors[-5:]) if proc.returncode else None,
+        "wall_seconds": round(wall, 4),
+        "import_seconds": round(total_us / 1e6, 4),
+        "top_level": sorted(top_level, key=lambda e: e["cumulative_seconds"], reverse=True),
+        "by_package": {k: round(v, 4) for k, v in sorted(packages.items(), key=lambda kv: kv[1], reverse=True)},
+    }
+
+
+def time_healthz(command: List[str], timeout: float = 60.0) -> float:
+    """Seconds from launching `command` in a fresh interpreter until /healthz answers."""
+    port = _free_port()
+    with tempfile.TemporaryDirectory(prefix="jarvis-healthz-") as metrics_dir:
+        env = {**os.environ, "PORT": str(port), "PROMETHEUS_MULTIPROC_DIR": metrics_dir}
+        started = time.perf_counter()
+        # Its own process group, so the health server it spawns is stopped with it
+        proc = subprocess.Popen(command, cwd=_ROOT, env=env, start_new_session=True,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while time.perf_counter() - started < timeout:
+                try:
+                    urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1).read()
+                    return time.perf_counter() - started
+                except OSError:
+                    if proc.poll() is not None:
+                        raise RuntimeError(f"{' '.join(command)} exited with code {proc.returncode} before /healthz answered")
+                    time.sleep(0.02)
+            raise RuntimeError(f"/healthz did not answer within {timeout}s")
+        finally:
+            try:
+                os.killpg(proc.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            proc.wait(5)
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="agent", help="Module to profile")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    report = profile_imports(args.module)
+    report["top_level"] = [{**e, "cumulative_seconds": round(e["cumulative_seconds"], 4),
+                            "self_seconds": round(e["self_seconds"], 4)} for e in report["top_level"][:args.top]]
+    for key, command in (
+        ("healthz_ready_seconds", [sys.executable, "agent.py"]),
+        ("healthz_ready_seconds_bound_after_imports",
+         [sys.executable, "-c", f"import {args.module}, health_server; health_server.spawn().wait()"]),
+    ):
+        try:
+            report[key] = round(time_healthz(command), 4)
+        except RuntimeError as e:
+            # e.g. the import fails in this environment; no number beats a made-up one
+            report[key] = None
+            report.setdefault("healthz_errors", []).append(str(e))
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
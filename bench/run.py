@@ -0,0 +1,478 @@
+"""
+Offline benchmark for session startup and tool latency.
+
+Starts local stand-ins for the n8n MCP server, mem0 and Tavily/wttr.in, then
+drives simulated rooms through the startup graph `agent.entrypoint` runs
+(startup.session_graph): journal, memory snapshot + index, pooled MCP lease and
+hot-attached tools, outreach goal status, with the LiveKit-side steps
+(session.start, ctx.connect, the greeting) replaced by configurable delays.
+Each room then makes a mix of calls to the assistant's tools (agent.py's
+Assistant gets the same tools.ASSISTANT_TOOLS, plus recall_memories) and the
+hot-attached MCP ones.
+
+By default every room runs in its own prewarmed process, like the worker's
+process executor: in-memory caches, the compiled-tool memo and a one-session
+MCP pool are per room, and only the disk caches are shared. --executor thread
+runs them all in this process, sharing all of that, like the thread executor.
+
+    python -m bench.run --rooms 8 --tool-calls 12 --output bench_output.json
+
+Results are printed (and optionally written) as JSON: cold start of the first
+room, startup phases and time-to-first-reply across concurrent rooms, and
+per-tool p50/p99. With --watchdog, also the call sites that blocked the event
+loop, worst first.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+from livekit.agents import function_tool
+
+from bench.standins import FakeMemoryClient, MCPStandIn, WebStandIn, cities, delay, school_queries
+
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=8, help="Concurrent rooms after the cold one")
+    parser.add_argument("--tool-calls", type=int, default=12, help="Tool calls per room")
+    parser.add_argument("--memories", type=int, default=200, help="Memories in the fake vault")
+    parser.add_argument("--executor", choices=("process", "thread"), default="process",
+                        help="Run each room in its own process (the worker's default) or all in this one")
+    parser.add_argument("--pool-size", type=int, default=1, help="Pooled MCP sessions (thread executor only)")
+    parser.add_argument("--mcp-latency", type=float, default=0.05)
+    parser.add_argument("--mem0-latency", type=float, default=0.3)
+    parser.add_argument("--search-latency", type=float, default=0.6, help="Basic search; advanced is 2.5x")
+    parser.add_argument("--weather-latency", type=float, default=0.15)
+    parser.add_argument("--session-start-latency", type=float, default=0.4, help="Stands in for session.start")
+    parser.add_argument("--connect-latency", type=float, default=0.2, help="Stands in for ctx.connect")
+    parser.add_argument("--reply-latency", type=float, default=0.5, help="Stands in for the first generate_reply")
+    parser.add_argument("--watchdog", type=float, metavar="SECONDS",
+                        help="Run the loop watchdog with this threshold and report what blocked the loop")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def _summary(values: List[float]) -> Dict[str, Any]:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))], 4)
+
+    return {"count": len(ordered), "p50": pct(50), "p90": pct(90), "p99": pct(99),
+            "mean": round(sum(ordered) / len(ordered), 4), "max": round(ordered[-1], 4)}
+
+
+class _BenchAgent:
+    """Just enough of agent.Assistant for its tools (recall_memories included) and hot-attaching MCP ones."""
+
+    def __init__(self, tools: List[Any], memory_index, injected_memory_ids=()):
+        self.memory_index = memory_index
+        self.injected_memory_ids = set(injected_memory_ids)
+        self.tools = list(tools) + [self.recall_memories]
+
+    async def update_tools(self, tools: List[Any]):
+        self.tools = list(tools)
+
+    @function_tool()
+    async def recall_memories(self, context: Any, query: str) -> str:
+        """Search Ivan's memory vault for details that aren't already in the conversation."""
+        return self.memory_index.recall(query, k=20, token_budget=400, exclude_ids=self.injected_memory_ids)
+
+
+class _BenchSession:
+    def generate_reply(self, **kwargs):
+        pass
+
+
+class _BenchContext:
+    """The RunContext the outreach tools use: a session to announce finished jobs on and key them by."""
+
+    def __init__(self):
+        self.session = _BenchSession()
+
+
+def _tool_name(tool: Any) -> str:
+    info = getattr(tool, "info", None)
+    return info.name if info is not None else tool.__name__
+
+
+def _merge_cache_stats(per_process: List[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Sum each cache's counters over processes and recompute its hit rate."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for caches in per_process:
+        for name, stats in caches.items():
+            totals = merged.setdefault(name, {"disk": stats["disk"]})
+            for field, value in stats.items():
+                if field not in ("disk", "hit_rate"):
+                    totals[field] = totals.get(field, 0) + value
+    for totals in merged.values():
+        served = sum(totals.get(k, 0) for k in ("hits", "stale_hits", "disk_hits", "coalesced"))
+        lookups = served + totals.get("misses", 0)
+        totals["hit_rate"] = round(served / lookups, 4) if lookups else 0.0
+    return merged
+
+
+def _room_process(args: argparse.Namespace, workdir: str, mcp_url: str, index: int, go, out):
+    """Entry point of a room's process: prewarm, report ready, run the room once `go` is set."""
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+    try:
+        out.put(("done", index, asyncio.run(Bench(args, workdir, mcp_url).isolated_room(index, go, out))))
+    except BaseException:
+        out.put(("error", index, traceback.format_exc()))
+
+
+class Bench:
+    def __init__(self, args: argparse.Namespace, workdir: str, mcp_url: Optional[str] = None):
+        self.args = args
+        self.workdir = workdir
+        self.mcp_url = mcp_url
+        self.mcp: Optional[MCPStandIn] = None
+        self.web: Optional[WebStandIn] = None
+        self.mem0 = FakeMemoryClient(memories=args.memories, latency=args.mem0_latency, seed=args.seed)
+        self.queries = school_queries(24, seed=args.seed)
+        self.cities = cities()
+
+    def start_standins(self):
+        self.mcp = MCPStandIn(latency=self.args.mcp_latency)
+        self.web = WebStandIn(search_latency=self.args.search_latency, weather_latency=self.args.weather_latency)
+        self.mcp.start()
+        self.web.start()
+        self.mcp_url = self.mcp.url
+        # The tools read their endpoints and caches from the environment at import time; room
+        # processes inherit it
+        os.environ.update({
+            "TAVILY_SEARCH_URL": self.web.search_url,
+            "WTTR_URL": self.web.weather_url,
+            "TAVILY_API_KEY": "bench",
+            "WEATHER_CACHE_PATH": os.path.join(self.workdir, "weather-cache.sqlite3"),
+            "SEARCH_CACHE_PATH": os.path.join(self.workdir, "search-cache.sqlite3"),
+            "OUTREACH_DB_PATH": os.path.join(self.workdir, "outreach.sqlite3"),
+        })
+
+    def stop_standins(self):
+        self.mcp.stop()
+        self.web.stop()
+
+    def build_pool(self):
+        from mcp_client import CallGuard, MCPServerPool, MCPServerSse, ToolSchemaStore
+
+        guard = CallGuard("bench-outreach", max_concurrency=8, call_timeout=15)
+        return MCPServerPool(
+            lambda: MCPServerSse(
+                params={"url": self.mcp_url}, cache_tools_list=True, name="bench-outreach",
+                tools_store=ToolSchemaStore(os.path.join(self.workdir, "mcp-tools")), call_guard=guard,
+            ),
+            # agent.py pools more than one session only with the thread executor
+            size=self.args.pool_size if self.args.executor == "thread" else 1,
+        )
+
+    @staticmethod
+    def _import_modules():
+        # Import up front, so import time (mostly livekit) doesn't land inside a measurement
+        import journal, memory, startup, tools  # noqa: F401
+        from mcp_client import agent_tools  # noqa: F401
+
+    async def _prewarm(self):
+        """Start an MCP pool as prewarm() does; returns it, prewarm seconds and seconds until it is ready."""
+        pool = self.build_pool()
+        prewarm_started = time.perf_counter()
+        # prewarm() returns once the pool thread is up; sessions keep connecting in the background
+        pool.start()
+        prewarm_seconds = time.perf_counter() - prewarm_started
+
+        async def pool_ready() -> float:
+            while not pool.stats()["healthy"]:
+                await asyncio.sleep(0.005)
+            return time.perf_counter() - prewarm_started
+
+        return pool, prewarm_seconds, asyncio.create_task(pool_ready())
+
+    async def room(self, index: int, pool) -> Dict[str, Any]:
+        """One simulated session, mirroring agent.entrypoint's startup path."""
+        import tools
+        from journal import ConversationJournal
+        from memory import MemoryIndex, MemorySnapshot
+        from livekit.agents.llm import RawFunctionTool
+        from mcp_client.agent_tools import MCPToolsIntegration
+        from startup import session_graph
+
+        args = self.args
+        rng = random.Random(f"{args.seed}:{index}")
+        phases: Dict[str, float] = {}
+        started = time.perf_counter()
+        journal = ConversationJournal(os.path.join(self.workdir, "journal.sqlite3"), None, user_id="Ivan",
+                                      session_id=f"bench-room-{index}")
+        snapshot = MemorySnapshot(os.path.join(self.workdir, "memory"), user_id="Ivan")
+        mcp_server = pool.server()
+        first_reply: Dict[str, float] = {}
+
+        async def mem0_client():
+            return self.mem0
+
+        async def journal_upload(mem0):
+            journal.client = mem0
+            journal.start()
+
+        async def load_memory():
+            return MemoryIndex(await asyncio.to_thread(snapshot.load))
+
+        async def build_agent(memory_index):
+            injected = memory_index.select("school outreach email list 100-school goal progress", k=20, token_budget=800)
+            return _BenchAgent(tools.ASSISTANT_TOOLS, memory_index, [m.get("id") for m in injected])
+
+        async def sync_memory(mem0, agent):
+            return asyncio.create_task(snapshot.sync(mem0))
+
+        async def attach_mcp_tools(agent):
+            await MCPToolsIntegration.attach_tools_in_background(agent, [mcp_server], server_timeout=10)
+
+        async def goal_status():
+            return await asyncio.to_thread(tools.outreach_store().goal_status, tools.OUTREACH_GOAL)
+
+        async def greet(*_):
+            await delay(args.reply_latency)
+            first_reply["at"] = time.perf_counter() - started
+
+        startup = session_graph(
+            {
+                "mem0_client": mem0_client, "journal_upload": journal_upload, "mem0_load": load_memory,
+                "build_agent": build_agent, "memory_sync": sync_memory, "mcp_tools_attached": attach_mcp_tools,
+                "session_start": lambda agent: delay(args.session_start_latency),
+                "ctx_connect": lambda: delay(args.connect_latency), "goal_status": goal_status,
+                "first_reply": greet,
+            },
+            mem0_client_timeout=5,
+            memory_timeout=3,
+            memory_fallback=lambda: MemoryIndex([]),
+            observe=phases.__setitem__,
+        )
+        results = await startup.run()
+        agent, memory_sync = results["build_agent"], results["memory_sync"]
+        time_to_first_reply = first_reply["at"]
+
+        by_name = {_tool_name(t): t for t in agent.tools}
+        context = _BenchContext()
+        calls: List[Dict[str, Any]] = []
+        for turn in range(args.tool_calls):
+            name, kwargs = self._pick_call(rng, turn, by_name, context)
+            call_started = time.perf_counter()
+            try:
+                tool = by_name[name]
+                # MCP tools take the model's arguments as they come, to validate them against the schema
+                result = await (tool(raw_arguments=kwargs) if isinstance(tool, RawFunctionTool) else tool(**kwargs))
+                ok = not str(result).startswith(("Error", "Search failed", "Could not"))
+            except Exception:
+                ok = False
+            calls.append({"tool": name, "seconds": time.perf_counter() - call_started, "ok": ok})
+            journal.append_nowait("user", f"turn {turn}: please run {name}")
+
+        await asyncio.gather(memory_sync, return_exceptions=True)
+        await journal.close()
+        await mcp_server.cleanup()
+        return {"phases": phases, "time_to_first_reply": time_to_first_reply, "calls": calls}
+
+    def _pick_call(self, rng: random.Random, turn: int, by_name: Dict[str, Callable], context: Any) -> tuple:
+        roll = rng.random()
+        if roll < 0.3:
+            return "search_web", {"context": context, "query": rng.choice(self.queries)}
+        if roll < 0.45:
+            return "get_weather", {"context": context, "city": rng.choice(self.cities)}
+        if roll < 0.55:
+            return "recall_memories", {"context": context, "query": rng.choice(self.queries)}
+        if roll < 0.65:
+            school = rng.choice(self.queries).split(" school")[0]
+            return rng.choice([
+                ("find_school_contacts", {"context": context, "schools": [school]}),
+                ("outreach_progress", {"context": context}),
+                ("outreach_goal_status", {"context": context}),
+                ("recently_contacted", {"context": context}),
+                ("check_outreach", {"context": context, "email_or_school": school}),
+            ])
+        if roll < 0.8 and "lookup_school" in by_name:
+            return "lookup_school", {"name": rng.choice(self.queries).split(" school")[0], "city": ""}
+        if "send_email" in by_name:
+            return "send_email", {"to": f"principal{turn}@example.edu", "subject": "Partnership", "body": "Hello"}
+        return "get_weather", {"context": context, "city": rng.choice(self.cities)}
+
+    async def isolated_room(self, index: int, go, out) -> Dict[str, Any]:
+        """Run in a room's own process: prewarm, tell the parent, then run one room once `go` is set."""
+        import cache
+        import http_client
+
+        self._import_modules()
+        if self.args.watchdog:
+            import loop_watchdog
+            loop_watchdog.ensure_watchdog(self.args.watchdog)
+        pool, prewarm_seconds, pool_ready = await self._prewarm()
+        # Like an idle worker process, the room's own pool is connected before the job arrives
+        pool_ready_seconds = await pool_ready
+        out.put(("ready", index, None))
+        await asyncio.to_thread(go.wait)
+        room = await self.room(index, pool)
+        room.update({
+            "prewarm_seconds": prewarm_seconds,
+            "pool_ready_seconds": pool_ready_seconds,
+            "caches": cache.all_stats(),
+            "mcp_pool": pool.stats(),
+            "mem0_calls": dict(self.mem0.calls),
+            "loop_blocks": loop_watchdog.worst_offenders(10) if self.args.watchdog else [],
+        })
+        await http_client.close()
+        await pool.aclose()
+        return room
+
+    def _run_processes(self) -> Dict[str, Any]:
+        """The cold room, then --rooms concurrent ones, each in its own process."""
+        context = multiprocessing.get_context("spawn")
+        out = context.Queue()
+
+        def run_group(indices: List[int]) -> List[Dict[str, Any]]:
+            go = context.Event()
+            processes = [context.Process(target=_room_process, args=(self.args, self.workdir, self.mcp_url, i, go, out),
+                                         daemon=True) for i in indices]
+            for process in processes:
+                process.start()
+            ready, done = set(), {}
+            try:
+                while len(done) < len(indices):
+                    kind, index, payload = out.get(timeout=120)
+                    if kind == "error":
+                        raise RuntimeError(f"Room {index} failed:\n{payload}")
+                    if kind == "ready":
+                        ready.add(index)
+                        if len(ready) == len(indices):
+                            go.set()
+                    else:
+                        done[index] = payload
+            finally:
+                for process in processes:
+                    process.join(timeout=10)
+                    if process.is_alive():
+                        process.kill()
+            return [done[i] for i in indices]
+
+        cold = run_group([0])[0]
+        warm = run_group([i + 1 for i in range(self.args.rooms)])
+        rooms = [cold, *warm]
+        mem0_calls: Dict[str, int] = {}
+        for room in rooms:
+            for name, count in room["mem0_calls"].items():
+                mem0_calls[name] = mem0_calls.get(name, 0) + count
+        return {
+            "cold": cold,
+            "warm": warm,
+            "prewarm_seconds": cold["prewarm_seconds"],
+            "pool_ready_seconds": cold["pool_ready_seconds"],
+            "caches": _merge_cache_stats([room["caches"] for room in rooms]),
+            "mcp_pool": [room["mcp_pool"] for room in rooms],
+            "mem0_calls": mem0_calls,
+            "loop_blocks": sorted((block for room in rooms for block in room["loop_blocks"]),
+                                  key=lambda block: block["total_seconds"], reverse=True)[:10],
+        }
+
+    async def _run_threads(self) -> Dict[str, Any]:
+        """The cold room, then --rooms concurrent ones, all in this process and sharing one pool."""
+        import cache
+        import http_client
+
+        self._import_modules()
+        if self.args.watchdog:
+            import loop_watchdog
+            loop_watchdog.ensure_watchdog(self.args.watchdog)
+
+        pool, prewarm_seconds, pool_ready = await self._prewarm()
+        cold = await self.room(0, pool)
+        warm = await asyncio.gather(*(self.room(i + 1, pool) for i in range(self.args.rooms)))
+        results = {
+            "cold": cold,
+            "warm": warm,
+            "prewarm_seconds": prewarm_seconds,
+            "pool_ready_seconds": await pool_ready,
+            "caches": cache.all_stats(),
+            "mcp_pool": pool.stats(),
+            "mem0_calls": dict(self.mem0.calls),
+            "loop_blocks": loop_watchdog.worst_offenders(10) if self.args.watchdog else [],
+        }
+        await http_client.close()
+        await pool.aclose()
+        return results
+
+    def run(self) -> Dict[str, Any]:
+        run = self._run_processes() if self.args.executor == "process" else asyncio.run(self._run_threads())
+        cold, warm = run["cold"], run["warm"]
+
+        tool_latencies: Dict[str, List[float]] = {}
+        tool_errors: Dict[str, int] = {}
+        for room in [cold, *warm]:
+            for call in room["calls"]:
+                tool_latencies.setdefault(call["tool"], []).append(call["seconds"])
+                tool_errors[call["tool"]] = tool_errors.get(call["tool"], 0) + (not call["ok"])
+        phase_names = sorted({name for room in warm for name in room["phases"]})
+
+        results = {
+            "config": {k: v for k, v in vars(self.args).items() if k not in ("output", "verbose")},
+            "isolation": (
+                "each room ran in its own prewarmed process with its own in-memory caches, compiled-tool memo "
+                "and one-session MCP pool, sharing only the disk caches (the worker's process executor)"
+                if self.args.executor == "process" else
+                "every room ran in this process, sharing the in-memory caches, the compiled-tool memo and "
+                "one MCP pool (the worker's thread executor)"
+            ),
+            "cold_start": {
+                "prewarm_seconds": round(run["prewarm_seconds"], 4),
+                "mcp_pool_ready_seconds": round(run["pool_ready_seconds"], 4),
+                "time_to_first_reply": round(cold["time_to_first_reply"], 4),
+                "phases": {k: round(v, 4) for k, v in cold["phases"].items()},
+            },
+            "concurrent_rooms": {
+                "rooms": len(warm),
+                "time_to_first_reply": _summary([room["time_to_first_reply"] for room in warm]),
+                "phases": {name: _summary([room["phases"][name] for room in warm if name in room["phases"]])
+                           for name in phase_names},
+            },
+            "tools": {name: {**_summary(values), "errors": tool_errors.get(name, 0)}
+                      for name, values in sorted(tool_latencies.items())},
+            "caches": run["caches"],
+            "mcp_pool": run["mcp_pool"],
+            "upstream_requests": {**self.web.requests, **{f"mem0_{k}": v for k, v in run["mem0_calls"].items()}},
+        }
+        if self.args.watchdog:
+            results["loop_blocks"] = run["loop_blocks"]
+        return results
+
+
+def main(argv: List[str]) -> int:
+    args = _parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+    workdir = tempfile.mkdtemp(prefix="jarvis-bench-")
+    bench = Bench(args, workdir)
+    bench.start_standins()
+    try:
+        results = bench.run()
+    finally:
+        bench.stop_standins()
+        shutil.rmtree(workdir, ignore_errors=True)
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
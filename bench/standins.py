@@ -0,0 +1,264 @@
+import asyncio
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from aiohttp import web
+from mcp.server.fastmcp import FastMCP
+
+_WORDS = (
+    "school principal email outreach list district contact admissions counselor newsletter follow-up "
+    "meeting science fair robotics club parents grant budget volunteer curriculum deadline reply goal"
+).split()
+_CITIES = ("Lagos", "Nairobi", "Accra", "London", "Austin", "Toronto", "Berlin", "Mumbai", "Tokyo", "Sydney")
+
+
+async def delay(mean: float, jitter: float = 0.25):
+    """Sleep around `mean` seconds, +/- `jitter` of it."""
+    if mean > 0:
+        await asyncio.sleep(random.uniform(mean * (1 - jitter), mean * (1 + jitter)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class _ServerThread:
+    """Runs a stand-in server on its own thread and loop, so it doesn't compete with the rooms being measured."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.port = _free_port()
+        self._thread: Optional[threading.Thread] = None
+
+    def _serve(self, started: threading.Event):
+        raise NotImplementedError
+
+    def start(self):
+        started = threading.Event()
+        self._thread = threading.Thread(target=self._serve, args=(started,), name=self.name, daemon=True)
+        self._thread.start()
+        if not started.wait(timeout=10):
+            raise RuntimeError(f"{self.name} stand-in did not start")
+
+
+class MCPStandIn(_ServerThread):
+    """
+    MCP server over HTTP+SSE, shaped like the n8n outreach server: a send_email tool,
+    a school lookup and `filler_tools` more so the tools list has a realistic size.
+    """
+
+    def __init__(self, latency: float = 0.05, filler_tools: int = 10):
+        super().__init__("mcp-standin")
+        self.latency = latency
+        self.filler_tools = filler_tools
+        self._server: Optional[uvicorn.Server] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/sse"
+
+    def _build(self) -> FastMCP:
+        mcp = FastMCP("bench-outreach", log_level="WARNING")
+
+        @mcp.tool()
+        async def send_email(to: str, subject: str, body: str) -> str:
+            """Send an outreach email."""
+            await delay(self.latency)
+            return f"Email queued for {to}"
+
+        @mcp.tool()
+        async def lookup_school(name: str, city: str = "") -> dict:
+            """Look up a school's public contact details."""
+            await delay(self.latency)
+            slug = "".join(c for c in name.lower() if c.isalnum())[:20]
+            return {"name": name, "city": city, "emails": [f"info@{slug}.edu", f"principal@{slug}.edu"]}
+
+        for i in range(self.filler_tools):
+            async def filler(query: str, limit: int = 10) -> str:
+                await delay(self.latency)
+                return "ok"
+            mcp.add_tool(filler, name=f"workflow_{i}", description=f"n8n workflow number {i}.")
+        return mcp
+
+    def _serve(self, started: threading.Event):
+        config = uvicorn.Config(self._build().sse_app(), host="127.0.0.1", port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        loop = asyncio.new_event_loop()
+
+        async def run():
+            serving = asyncio.create_task(self._server.serve())
+            while not self._server.started:
+                await asyncio.sleep(0.01)
+            started.set()
+            await serving
+
+        loop.run_until_complete(run())
+        # SSE streams still open when the server exits
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+
+class WebStandIn(_ServerThread):
+    """
+    Tavily search API and wttr.in in one HTTP server. Advanced searches take
+    `advanced_factor` times longer than basic ones and are more likely to carry a
+    direct answer, like the real service.
+    """
+
+    def __init__(self, search_latency: float = 0.6, weather_latency: float = 0.15, advanced_factor: float = 2.5,
+                 answer_rate: float = 0.5, content_chars: int = 1200):
+        super().__init__("web-standin")
+        self.search_latency = search_latency
+        self.weather_latency = weather_latency
+        self.advanced_factor = advanced_factor
+        self.answer_rate = answer_rate
+        self.content_chars = content_chars
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.requests: Dict[str, int] = {"search_basic": 0, "search_advanced": 0, "weather": 0}
+
+    @property
+    def search_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/search"
+
+    @property
+    def weather_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/weather"
+
+    async def _search(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        depth = payload.get("search_depth", "basic")
+        self.requests[f"search_{depth}"] = self.requests.get(f"search_{depth}", 0) + 1
+        advanced = depth == "advanced"
+        await delay(self.search_latency * (self.advanced_factor if advanced else 1))
+        query = payload.get("query", "")
+        rng = random.Random(f"{query}:{depth}")
+        answered = rng.random() < (self.answer_rate if advanced else self.answer_rate / 2)
+        words = " ".join(rng.choice(_WORDS) for _ in range(self.content_chars // 7))
+        results = [
+            {"title": f"{query.title()} - result {i + 1}", "url": f"https://example.org/{i}",
+             "content": words[:self.content_chars], "score": round(rng.uniform(0.3, 0.95), 2)}
+            for i in range(int(payload.get("max_results", 5)))
+        ]
+        return web.json_response({
+            "query": query,
+            "answer": f"The main contact for {query} is the front office." if answered and payload.get("include_answer") else None,
+            "results": results,
+        })
+
+    async def _weather(self, request: web.Request) -> web.Response:
+        self.requests["weather"] += 1
+        await delay(self.weather_latency)
+        return web.Response(text=f"Partly cloudy +{len(request.match_info['city']) + 15}°C with wind at 11km/h\n")
+
+    def _serve(self, started: threading.Event):
+        app = web.Application()
+        app.router.add_post("/search", self._search)
+        app.router.add_get("/weather/{city}", self._weather)
+        self._loop = asyncio.new_event_loop()
+        runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(runner.setup())
+        self._loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", self.port).start())
+        started.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(runner.cleanup())
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+
+class FakeMemoryClient:
+    """
+    In-memory AsyncMemoryClient with latency. Mirrors mem0ai's v3 API: get_all and search take
+    `filters` (incl. `updated_at` ranges and `metadata`) and reject top-level user_id, and get_all is paginated.
+    """
+
+    def __init__(self, memories: int = 200, latency: float = 0.3, seed: int = 7):
+        rng = random.Random(seed)
+        now = datetime.now(timezone.utc)
+        self.latency = latency
+        self.records: List[Dict[str, Any]] = [
+            {
+                "id": f"mem-{i}",
+                "memory": " ".join(rng.choice(_WORDS) for _ in range(rng.randint(6, 24))),
+                "updated_at": (now - timedelta(days=rng.uniform(0, 120))).isoformat(),
+            }
+            for i in range(memories)
+        ]
+        self.added: List[Dict[str, Any]] = []
+        self.calls: Dict[str, int] = {"get_all": 0, "search": 0, "add": 0}
+
+    @staticmethod
+    def _reject_entity_params(method: str, kwargs: Dict[str, Any]):
+        invalid = {"user_id", "agent_id", "app_id", "run_id"} & set(kwargs)
+        if invalid:
+            raise ValueError(f"Top-level entity parameters {invalid} are not supported in {method}(). "
+                             "Use filters={'user_id': '...'} instead.")
+
+    async def get_all(self, filters: Optional[Dict[str, Any]] = None, page: int = 1, page_size: int = 100,
+                      **kwargs) -> Dict[str, Any]:
+        self._reject_entity_params("get_all", kwargs)
+        self.calls["get_all"] += 1
+        await delay(self.latency)
+        since, metadata = None, None
+        for clause in (filters or {}).get("AND", []):
+            since = clause.get("updated_at", {}).get("gte", since)
+            metadata = clause.get("metadata", metadata)
+        matching = [r for r in self.records if since is None or r["updated_at"] >= since]
+        if metadata is not None:
+            # What add() stored, as the memories mem0 would have extracted from it
+            matching = [
+                {"id": f"added-{i}", "memory": " ".join(m["content"] for m in added["messages"]),
+                 "metadata": added["metadata"]}
+                for i, added in enumerate(self.added)
+                if all((added["metadata"] or {}).get(k) == v for k, v in metadata.items())
+            ]
+        start = (page - 1) * page_size
+        more = start + page_size < len(matching)
+        return {
+            "count": len(matching),
+            "next": f"/v3/memories/?page={page + 1}&page_size={page_size}" if more else None,
+            "previous": f"/v3/memories/?page={page - 1}&page_size={page_size}" if page > 1 else None,
+            "results": matching[start:start + page_size],
+        }
+
+    async def search(self, query: str, filters: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        self._reject_entity_params("search", kwargs)
+        self.calls["search"] += 1
+        await delay(self.latency)
+        terms = set(query.lower().split())
+        return {"results": [r for r in self.records if terms & set(r["memory"].split())][:10]}
+
+    async def add(self, messages: List[Dict[str, str]], user_id: Optional[str] = None,
+                  metadata: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        self.calls["add"] += 1
+        await delay(self.latency)
+        self.added.append({"messages": messages, "user_id": user_id, "metadata": metadata, "at": time.time()})
+        return {"results": []}
+
+
+def school_queries(count: int, seed: int = 11) -> List[str]:
+    rng = random.Random(seed)
+    return [f"{rng.choice(('St.', 'Green', 'Lake', 'Hill', 'Royal'))} {rng.choice(('Mary', 'Valley', 'Park', 'Ridge'))} "
+            f"{rng.choice(('High', 'Academy', 'Primary', 'College'))} school {rng.choice(_CITIES)} contact email"
+            for _ in range(count)]
+
+
+def cities() -> List[str]:
+    return list(_CITIES)
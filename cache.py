@@ -0,0 +1,247 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger("result-cache")
+
+# Every cache registers itself here so operators can inspect them all at once
+_registry: Dict[str, "TTLCache"] = {}
+
+
+def all_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats of every cache created in this process, keyed by cache name."""
+    return {name: cache.stats() for name, cache in _registry.items()}
+
+
+class _DiskTier:
+    """SQLite-backed second tier so cached results survive worker restarts."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            # Every job process opens the same file
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            return self._conn.execute("SELECT value, stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+
+    def put(self, key: str, value: str, stored_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, stored_at) VALUES (?, ?, ?)", (key, value, stored_at)
+            )
+            self._conn.commit()
+
+    def prune(self, older_than: float):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE stored_at < ?", (older_than,))
+            self._conn.commit()
+
+
+class TTLCache:
+    """
+    Bounded in-process cache with TTL expiry and LRU eviction.
+
+    Values must be JSON-serializable; their encoded size is what counts towards
+    `max_bytes` and what the optional disk tier stores. Concurrent loads of the
+    same key are coalesced into a single call of the loader, which runs in its
+    own task so a caller that is cancelled doesn't fail the others. With `stale_ttl`
+    set, expired entries keep being served for that long while a background
+    load refreshes them (stale-while-revalidate).
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = 512, max_bytes: int = 8 * 1024 * 1024,
+                 disk_path: Optional[str] = None, stale_ttl: float = 0):
+        """
+        Args:
+            name: Name reported in stats.
+            ttl: Seconds an entry is served from cache.
+            max_entries: Maximum number of entries kept in memory.
+            max_bytes: Maximum total encoded size of the entries kept in memory.
+            disk_path: Optional SQLite file used as a persistent second tier.
+            stale_ttl: Seconds past `ttl` an entry is still served while it is refreshed.
+        """
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (value, stored_at, size)
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Strong references to running loads; the event loop only keeps weak ones
+        self._loads = set()
+        self._bytes = 0
+        self._disk: Optional[_DiskTier] = None
+        if disk_path:
+            try:
+                self._disk = _DiskTier(disk_path)
+                self._disk.prune(time.time() - ttl - stale_ttl)
+            except Exception as e:
+                logger.error(f"Disk tier for cache '{name}' unavailable at {disk_path}: {e}")
+        self._stats = {"hits": 0, "disk_hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "coalesced": 0, "evictions": 0, "load_errors": 0}
+        _registry[name] = self
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a fresh in-memory value or None."""
+        entry = self._lookup(key)
+        return entry[0] if entry is not None and entry[1] else None
+
+    def _lookup(self, key: str) -> Optional[Tuple[Any, bool]]:
+        """Return (value, is_fresh) for an entry that may still be served, dropping dead ones."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at, _ = entry
+        age = time.time() - stored_at
+        if age > self.ttl + self.stale_ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value, age <= self.ttl
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None, encoded: Optional[str] = None):
+        """Store a value in memory, evicting least recently used entries past the bounds."""
+        encoded = encoded if encoded is not None else json.dumps(value)
+        size = len(encoded.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (value, stored_at or time.time(), size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats["evictions"] += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for `key`, calling `loader` once on a miss."""
+        entry = self._lookup(key)
+        if entry is not None:
+            value, fresh = entry
+            if fresh:
+                self._stats["hits"] += 1
+            else:
+                self._stats["stale_hits"] += 1
+                self._refresh_in_background(key, loader)
+            return value
+
+        inflight = self._inflight_for(key)
+        coalesced = inflight is not None
+        if not coalesced:
+            inflight = self._start_load(key, loader)
+        # Cancelling this caller leaves the load running for everyone else waiting on it
+        value = await asyncio.shield(inflight)
+        if coalesced:
+            self._stats["coalesced"] += 1
+        return value
+
+    def _inflight_for(self, key: str) -> Optional[asyncio.Task]:
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight.get_loop() is asyncio.get_running_loop():
+            return inflight
+        return None
+
+    def _refresh_in_background(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        if self._inflight_for(key) is None:
+            self._start_load(key, loader, background=True)
+
+    def _start_load(self, key: str, loader: Callable[[], Awaitable[Any]], background: bool = False) -> asyncio.Task:
+        # Registered now, so lookups before the task starts don't spawn another load
+        task = asyncio.ensure_future(self._load(key, loader, background))
+        self._inflight[key] = task
+        self._loads.add(task)
+        task.add_done_callback(lambda done: self._on_load_done(key, done, background))
+        return task
+
+    def _on_load_done(self, key: str, task: asyncio.Task, background: bool):
+        self._loads.discard(task)
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieved here, so a load nobody waited for doesn't warn about it
+        error = None if task.cancelled() else task.exception()
+        if error is not None and background:
+            logger.warning(f"Background refresh failed for cache '{self.name}': {error}")
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], background: bool = False) -> Any:
+        try:
+            # A background refresh replaces a stale entry; the disk copy is no newer
+            value = None if background else await self._load_from_disk(key, loader)
+            if value is None:
+                self._stats["refreshes" if background else "misses"] += 1
+                value = await loader()
+                self._store(key, value)
+            return value
+        except BaseException:
+            self._stats["load_errors"] += 1
+            raise
+        finally:
+            # Released before the task's done callbacks run, so a refresh scheduled by this load isn't coalesced into it
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    async def _load_from_disk(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Optional[Any]:
+        if self._disk is None:
+            return None
+        try:
+            row = await asyncio.to_thread(self._disk.get, key)
+        except Exception as e:
+            logger.warning(f"Disk read failed for cache '{self.name}': {e}")
+            return None
+        if row is None or time.time() - row[1] > self.ttl + self.stale_ttl:
+            return None
+        value = json.loads(row[0])
+        self.set(key, value, stored_at=row[1], encoded=row[0])
+        self._stats["disk_hits"] += 1
+        if time.time() - row[1] > self.ttl:
+            # Runs once this load has finished, so the refresh isn't coalesced into it
+            asyncio.get_running_loop().call_soon(self._refresh_in_background, key, loader)
+        return value
+
+    def _store(self, key: str, value: Any):
+        encoded = json.dumps(value)
+        stored_at = time.time()
+        self.set(key, value, stored_at=stored_at, encoded=encoded)
+        if self._disk is not None:
+            task = asyncio.get_running_loop().run_in_executor(None, self._disk.put, key, encoded, stored_at)
+            task.add_done_callback(self._log_disk_error)
+
+    def _log_disk_error(self, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"Disk write failed for cache '{self.name}': {future.exception()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus current size; `hit_rate` counts every lookup served without a load of its own."""
+        served = sum(self._stats[k] for k in ("hits", "stale_hits", "disk_hits", "coalesced"))
+        lookups = served + self._stats["misses"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+            "disk": self._disk is not None,
+        }
+
+
+async def log_stats():
+    """Log every cache's stats; registered as a job shutdown callback."""
+    for name, stats in all_stats().items():
+        logger.info(f"Cache '{name}': {stats}")
@@ -0,0 +1,3 @@
+# Tests import the service's modules from the repository root. test_mem0.py is a manual script
+# against the live mem0 API, not a test.
+collect_ignore = ["test_mem0.py"]
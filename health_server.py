@@ -0,0 +1,102 @@
+"""
+Health and metrics server, run as its own process so a busy worker can never
+delay /healthz, which says the agent is alive; /readyz says its worker has
+registered and can take jobs. Keep this module light: it must not import
+livekit or the agent, and the parent that only spawns and supervises it
+doesn't import the web stack.
+"""
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Optional
+
+# The worker rewrites its load report every half second; one older than this means its loop is
+# stuck or it is gone, and /healthz fails so the platform restarts it
+HEARTBEAT_STALE_SECONDS = float(os.environ.get("HEALTH_HEARTBEAT_STALE_SECONDS", 15))
+
+
+def create_app():
+    from fastapi import FastAPI, Response
+    from fastapi.responses import JSONResponse
+
+    import load
+    import metrics
+
+    app = FastAPI()
+
+    @app.get("/healthz")
+    async def health_check():
+        """Render and cron-job.org heartbeat; online until the worker's heartbeat goes stale."""
+        age = load.read_report().get("age_seconds")
+        # No report yet while the worker is still starting up
+        if age is not None and age > HEARTBEAT_STALE_SECONDS:
+            return JSONResponse({"status": "stalled", "agent": "Jarvis", "heartbeat_age_seconds": age}, status_code=503)
+        return {"status": "online", "agent": "Jarvis"}
+
+    @app.get("/readyz")
+    async def readiness_check():
+        """Ready once the worker has registered with LiveKit and its heartbeat is fresh; 503 until then."""
+        report = load.read_report()
+        age = report.get("age_seconds")
+        ready = bool(report.get("registered")) and age is not None and age <= HEARTBEAT_STALE_SECONDS
+        return JSONResponse({"ready": ready, "agent": "Jarvis"}, status_code=200 if ready else 503)
+
+    @app.get("/metrics")
+    async def prometheus_metrics():
+        """Prometheus scrape target: startup phase latencies, tool call durations, cache hit ratios, active sessions."""
+        return Response(await asyncio.to_thread(metrics.render), media_type=metrics.CONTENT_TYPE)
+
+    @app.get("/load")
+    async def worker_load():
+        """The worker's current load, which signal limits it and whether it is taking new jobs."""
+        return load.read_report()
+
+    return app
+
+
+# The LiveKit worker points PROMETHEUS_MULTIPROC_DIR at the job processes' directory once it
+# starts; a restarted server must still read from the service's
+_METRICS_ENV = {"PROMETHEUS_MULTIPROC_DIR": os.environ["PROMETHEUS_MULTIPROC_DIR"]} \
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ else {}
+
+
+def _exit_with_parent(parent: int, interval: float = 1.0):
+    """Shut this server down once the process that spawned it is gone, so it can't keep reporting online."""
+    while os.getppid() == parent:
+        time.sleep(interval)
+    logging.error("Agent process exited, stopping the health server")
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def spawn() -> subprocess.Popen:
+    """Start the server in a child process; it reads PORT and PROMETHEUS_MULTIPROC_DIR from the environment."""
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__)], env={**os.environ, **_METRICS_ENV})
+
+
+async def supervise(proc: Optional[subprocess.Popen] = None, check_interval: float = 1.0):
+    """Keep a health server process (`proc`, or a new one) running until cancelled, restarting it if it exits."""
+    proc = proc or spawn()
+    try:
+        while True:
+            await asyncio.sleep(check_interval)
+            if proc.poll() is not None:
+                logging.error(f"Health server exited with code {proc.returncode}, restarting")
+                proc = spawn()
+    finally:
+        proc.terminate()
+        try:
+            await asyncio.to_thread(proc.wait, 5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    threading.Thread(target=_exit_with_parent, args=(os.getppid(),), daemon=True).start()
+    uvicorn.run(create_app(), host="0.0.0.0", port=int(os.environ.get("PORT", 8080)), log_level="info")
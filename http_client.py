@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import os
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger("http-client")
+
+# Pool sizing. Every tool shares one keep-alive pool per event loop, so these
+# bound the sockets a single worker opens towards Tavily, wttr.in, etc.
+HTTP_POOL_LIMIT = int(os.environ.get("HTTP_POOL_LIMIT", 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.environ.get("HTTP_POOL_LIMIT_PER_HOST", 10))
+HTTP_KEEPALIVE_TIMEOUT = float(os.environ.get("HTTP_KEEPALIVE_TIMEOUT", 60))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 3))
+HTTP_DEFAULT_TIMEOUT = float(os.environ.get("HTTP_DEFAULT_TIMEOUT", 10))
+
+# One session per event loop: aiohttp sessions are bound to the loop that
+# created them, and threaded job executors run each job on its own loop.
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Return the pooled session for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_DEFAULT_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        )
+        _sessions[loop] = session
+        logger.debug(f"Created pooled HTTP session (limit={HTTP_POOL_LIMIT}, per_host={HTTP_POOL_LIMIT_PER_HOST})")
+    return session
+
+
+def _timeout(deadline: Optional[float]) -> aiohttp.ClientTimeout:
+    return aiohttp.ClientTimeout(total=deadline or HTTP_DEFAULT_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+
+async def get_text(url: str, timeout: Optional[float] = None, **kwargs) -> Tuple[int, str]:
+    """GET a URL and return (status, body text). `timeout` is a per-call deadline in seconds."""
+    async with get_session().get(url, timeout=_timeout(timeout), **kwargs) as response:
+        return response.status, await response.text()
+
+
+async def post_json(url: str, payload: Dict[str, Any], timeout: Optional[float] = None,
+                    headers: Optional[Dict[str, str]] = None) -> Tuple[int, Any]:
+    """POST a JSON payload and return (status, decoded JSON body)."""
+    async with get_session().post(url, json=payload, headers=headers, timeout=_timeout(timeout)) as response:
+        return response.status, await response.json(content_type=None)
+
+
+async def close():
+    """Close the pooled session of the running loop, if any."""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from memory import memory_records
+
+logger = logging.getLogger("conversation-journal")
+
+
+class ConversationJournal:
+    """
+    Write-behind journal of conversation turns, uploaded to mem0 in the background.
+
+    Every turn is appended to a local SQLite journal as soon as it happens. A flusher
+    task uploads pending turns in batches with retries; a batch is claimed atomically,
+    so two workers sharing the journal never upload it at the same time, and it is
+    marked uploaded only after mem0 accepts it, so nothing is lost when mem0 is slow
+    or the worker dies. Any journaled turns still pending, including ones left behind
+    by a crashed session, are uploaded by the next flush for the same user.
+
+    Each batch is uploaded with its id as `journal_batch` metadata, and a batch keeps
+    its id and turns across retries. Before a batch that was already attempted is sent
+    again (its upload timed out, or the worker died before it was acknowledged), mem0
+    is asked for memories carrying that id, and the batch is only marked uploaded if
+    it has some. mem0 extracts memories in the background, so a retry that comes
+    before the first attempt was processed can still add the turns twice.
+    """
+
+    def __init__(self, path: str, client: Any, user_id: str, session_id: Optional[str] = None,
+                 batch_size: int = 20, flush_interval: float = 10.0, claim_ttl: float = 60.0,
+                 max_backoff: float = 60.0, retention: float = 7 * 86400):
+        """
+        Args:
+            path: SQLite file holding the journal; may be shared by several workers.
+            client: mem0 client (anything with an async `add(messages, user_id=..., metadata=...)` and
+                `get_all(filters=..., page=..., page_size=...)`), or None to only journal until one is assigned to `client`.
+            user_id: The mem0 user the turns belong to.
+            session_id: Identifies the session that wrote a turn.
+            batch_size: Maximum turns per upload; reaching it triggers an early flush.
+            flush_interval: Seconds between background flushes.
+            claim_ttl: Seconds a worker owns a batch it is uploading before others may retry it.
+            max_backoff: Upper bound for the retry delay after a failed upload.
+            retention: Seconds uploaded turns are kept; older ones are pruned when the journal closes.
+        """
+        self.client = client
+        self.user_id = user_id
+        self.session_id = session_id or uuid.uuid4().hex
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.claim_ttl = claim_ttl
+        self.max_backoff = max_backoff
+        self.retention = retention
+        self._closed = False
+        self._owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS turns (id TEXT PRIMARY KEY, user_id TEXT NOT NULL, session_id TEXT NOT NULL, "
+                "role TEXT NOT NULL, content TEXT NOT NULL, ts REAL NOT NULL, batch_id TEXT, claimed_by TEXT, "
+                "claimed_until REAL, uploaded_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS turns_pending ON turns (user_id, uploaded_at, ts)")
+            self._conn.commit()
+        self._pending = 0
+        self._wake = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._writes = set()
+        self.stats = {"appended": 0, "uploaded": 0, "batches": 0, "failures": 0, "deduplicated": 0}
+
+    def start(self):
+        """Start the background flusher; it also replays turns left pending by earlier sessions."""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run(), name="journal-flusher")
+
+    async def append(self, role: str, content: str):
+        """Journal one turn locally; uploading happens later in the background."""
+        content = content.strip()
+        if not content or self._closed:
+            return
+        # Timestamp before the hand-off to the thread pool, so turns keep their order
+        await asyncio.to_thread(self._insert, uuid.uuid4().hex, role, content, time.time())
+        self.stats["appended"] += 1
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self._wake.set()
+
+    def append_nowait(self, role: str, content: str):
+        """Journal a turn from synchronous code such as an event handler."""
+        task = asyncio.create_task(self.append(role, content))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    def _insert(self, turn_id: str, role: str, content: str, ts: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO turns (id, user_id, session_id, role, content, ts) VALUES (?, ?, ?, ?, ?, ?)",
+                (turn_id, self.user_id, self.session_id, role, content, ts),
+            )
+            self._conn.commit()
+
+    def _claim_batch(self) -> Optional[Tuple[str, List[Dict[str, str]], bool]]:
+        """
+        Claim the oldest pending batch (an existing one if a retry is due) and return
+        (batch_id, messages, retry), `retry` telling whether it was attempted before.
+        """
+        with self._lock:
+            while True:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT batch_id FROM turns WHERE user_id = ? AND uploaded_at IS NULL "
+                    "AND (claimed_until IS NULL OR claimed_until < ?) ORDER BY ts LIMIT 1",
+                    (self.user_id, now),
+                ).fetchone()
+                if row is None:
+                    return None
+                batch_id = row[0]
+                retry = batch_id is not None
+                if not retry:
+                    # Form a new batch and claim it in one write, so no other worker can claim it in between.
+                    # Its turns stay together, so retries resend exactly the same turns
+                    batch_id = uuid.uuid4().hex
+                    claimed = self._conn.execute(
+                        "UPDATE turns SET batch_id = ?, claimed_by = ?, claimed_until = ? WHERE id IN "
+                        "(SELECT id FROM turns WHERE user_id = ? AND uploaded_at IS NULL AND batch_id IS NULL "
+                        "ORDER BY ts LIMIT ?)",
+                        (batch_id, self._owner, now + self.claim_ttl, self.user_id, self.batch_size),
+                    ).rowcount
+                else:
+                    # Only if no other worker claimed it since the SELECT
+                    claimed = self._conn.execute(
+                        "UPDATE turns SET claimed_by = ?, claimed_until = ? WHERE batch_id = ? "
+                        "AND uploaded_at IS NULL AND (claimed_until IS NULL OR claimed_until < ?)",
+                        (self._owner, now + self.claim_ttl, batch_id, now),
+                    ).rowcount
+                self._conn.commit()
+                if not claimed:
+                    # Another worker got there first; look again
+                    continue
+                rows = self._conn.execute(
+                    "SELECT role, content FROM turns WHERE batch_id = ? AND claimed_by = ? ORDER BY ts",
+                    (batch_id, self._owner),
+                ).fetchall()
+                if rows:
+                    return batch_id, [{"role": role, "content": content} for role, content in rows], retry
+
+    def _finish_batch(self, batch_id: str, uploaded: bool):
+        with self._lock:
+            if uploaded:
+                self._conn.execute(
+                    "UPDATE turns SET uploaded_at = ?, claimed_by = NULL, claimed_until = NULL WHERE batch_id = ?",
+                    (time.time(), batch_id),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE turns SET claimed_by = NULL, claimed_until = NULL WHERE batch_id = ? AND claimed_by = ?",
+                    (batch_id, self._owner),
+                )
+            self._conn.commit()
+
+    async def flush(self) -> int:
+        """Upload every pending batch for this user; returns the number of turns uploaded."""
+        if self.client is None:
+            # Journal-only until a client is attached; the turns wait for a later session
+            return 0
+        uploaded = 0
+        async with self._flush_lock:
+            while True:
+                claimed = await asyncio.to_thread(self._claim_batch)
+                if claimed is None:
+                    break
+                batch_id, messages, retry = claimed
+                try:
+                    if retry and await self._already_uploaded(batch_id):
+                        self.stats["deduplicated"] += 1
+                    else:
+                        await self.client.add(messages, user_id=self.user_id, metadata={"journal_batch": batch_id})
+                except BaseException:
+                    self.stats["failures"] += 1
+                    await asyncio.shield(asyncio.to_thread(self._finish_batch, batch_id, False))
+                    raise
+                await asyncio.to_thread(self._finish_batch, batch_id, True)
+                self.stats["batches"] += 1
+                self.stats["uploaded"] += len(messages)
+                uploaded += len(messages)
+            self._pending = 0
+        return uploaded
+
+    async def _already_uploaded(self, batch_id: str) -> bool:
+        """Whether mem0 holds memories from an earlier, unacknowledged upload of this batch."""
+        response = await self.client.get_all(
+            filters={"AND": [{"user_id": self.user_id}, {"metadata": {"journal_batch": batch_id}}]}, page=1, page_size=1
+        )
+        return bool(memory_records(response))
+
+    async def _run(self):
+        backoff = 1.0
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Journal upload failed, retrying in {backoff:.0f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    async def close(self, timeout: float = 5.0):
+        """Stop the flusher and make a last upload attempt; whatever fails stays journaled."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await asyncio.gather(*self._writes, return_exceptions=True)
+        try:
+            await asyncio.wait_for(self.flush(), timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Final journal upload incomplete, pending turns will be replayed: {e}")
+        logger.info(f"Journal for session {self.session_id}: {self.stats}")
+        self._closed = True
+        try:
+            await asyncio.to_thread(self.prune, time.time() - self.retention)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not prune the journal: {e}")
+        with self._lock:
+            self._conn.close()
+
+    def prune(self, older_than: float):
+        """Delete uploaded turns journaled before `older_than` (epoch seconds)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM turns WHERE uploaded_at IS NOT NULL AND ts < ?", (older_than,))
+            self._conn.commit()
@@ -0,0 +1,136 @@
+"""
+Worker load for LiveKit job admission. The load is the most constrained of four
+signals, each as a share of its limit: active sessions, event loop lag, CPU and
+pending tool calls (local and MCP). The worker stops taking jobs once it reaches
+the load threshold, before any of them is saturated and voice latency degrades.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+import psutil
+
+import metrics
+
+logger = logging.getLogger("worker-load")
+
+# Where the worker publishes its latest load for the health server's /load route
+LOAD_REPORT_PATH = os.environ.get("WORKER_LOAD_REPORT", ".cache/worker-load.json")
+
+# Per-loop lag, so jobs sharing a process (thread executor) report the worst of their loops. Probes
+# are held weakly: a task references its loop, and would keep a finished job's loop alive as a value
+_loop_lag: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, float]" = weakref.WeakKeyDictionary()
+_lag_probes: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, weakref.ref]" = weakref.WeakKeyDictionary()
+
+
+async def _probe_lag(interval: float, decay: float):
+    loop = asyncio.get_running_loop()
+    peak = 0.0
+    try:
+        while True:
+            scheduled = loop.time()
+            await asyncio.sleep(interval)
+            lag = max(0.0, loop.time() - scheduled - interval)
+            # Hold on to spikes for a few samples, so a load check between two probes still sees them
+            peak = max(lag, peak * decay)
+            _loop_lag[loop] = peak
+            metrics.EVENT_LOOP_LAG.set(max(_loop_lag.values()))
+    finally:
+        _loop_lag.pop(loop, None)
+        _lag_probes.pop(loop, None)
+        metrics.EVENT_LOOP_LAG.set(max(_loop_lag.values(), default=0.0))
+
+
+def ensure_lag_probe(interval: float = 0.25, decay: float = 0.8) -> asyncio.Task:
+    """Measure the running loop's lag until it closes; one probe per loop, however often this is called."""
+    loop = asyncio.get_running_loop()
+    ref = _lag_probes.get(loop)
+    probe = ref() if ref is not None else None
+    if probe is None or probe.done():
+        probe = loop.create_task(_probe_lag(interval, decay))
+        _lag_probes[loop] = weakref.ref(probe)
+    return probe
+
+
+class LoadMonitor:
+    """
+    `load_fnc` for WorkerOptions. Limits are the points where a signal is saturated;
+    pass `threshold` as the options' `load_threshold`.
+    """
+
+    def __init__(self, max_sessions: int, max_loop_lag: float = 0.1, max_cpu: float = 0.9,
+                 max_pending_calls: int = 32, threshold: float = 0.8, report_path: Optional[str] = LOAD_REPORT_PATH):
+        self.limits = {
+            "active_sessions": max_sessions,
+            "event_loop_lag_seconds": max_loop_lag,
+            "cpu": max_cpu,
+            "pending_tool_calls": max_pending_calls,
+        }
+        self.threshold = threshold
+        self.report_path = report_path
+        self.last: Dict[str, Any] = {}
+        # Set once the worker has registered with the LiveKit server and can be dispatched jobs
+        self.registered = False
+        # Without a prior sample the first reading covers no interval and is meaningless
+        psutil.cpu_percent(interval=None)
+
+    def sample(self) -> Dict[str, Any]:
+        signals = metrics.live_values()
+        signals["cpu"] = psutil.cpu_percent(interval=None) / 100
+        ratios = {name: signals[name] / limit if limit > 0 else 0.0 for name, limit in self.limits.items()}
+        limiting = max(ratios, key=ratios.get)
+        load = min(1.0, ratios[limiting])
+        return {
+            "load": round(load, 4),
+            "threshold": self.threshold,
+            "accepting_jobs": load < self.threshold,
+            "limiting": limiting,
+            "signals": {name: round(value, 4) for name, value in signals.items()},
+            "limits": self.limits,
+            "registered": self.registered,
+            "at": time.time(),
+        }
+
+    def __call__(self, worker: Any = None) -> float:
+        try:
+            report = self.sample()
+        except Exception as e:
+            # Keep the last known load rather than opening the worker up because a sample failed
+            logger.warning(f"Could not sample worker load: {e}")
+            return self.last.get("load", 0.0)
+        if report["accepting_jobs"] != self.last.get("accepting_jobs", True):
+            state = "accepting jobs again" if report["accepting_jobs"] else "no longer accepting jobs"
+            logger.info(f"Worker {state}: load {report['load']} ({report['limiting']})")
+        self.last = report
+        if self.report_path:
+            self._publish(report)
+        return report["load"]
+
+    def mark_registered(self, *args: Any):
+        """Handler for the worker's `worker_registered` event; the next report says the worker is ready."""
+        self.registered = True
+
+    def _publish(self, report: Dict[str, Any]):
+        try:
+            os.makedirs(os.path.dirname(self.report_path) or ".", exist_ok=True)
+            tmp = f"{self.report_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(report, f)
+            os.replace(tmp, self.report_path)
+        except OSError as e:
+            logger.debug(f"Could not write the load report: {e}")
+
+
+def read_report(path: str = LOAD_REPORT_PATH) -> Dict[str, Any]:
+    """The worker's latest load report, with its age; `{"status": "unknown"}` before the first one."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return {"status": "unknown"}
+    report["age_seconds"] = round(time.time() - report["at"], 3)
+    return report
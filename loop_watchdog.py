@@ -0,0 +1,186 @@
+"""
+Opt-in watchdog for calls that block the event loop. A heartbeat on the loop
+measures its lag continuously; when a beat is late by more than the threshold,
+a helper thread captures the loop thread's stack while it is still blocked, and
+the beat that finally runs records how long the block lasted. Blocks are grouped
+by the innermost frame in our own code (the line that made the blocking call).
+"""
+import asyncio
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger("loop-watchdog")
+
+_DISPATCH_FILE = os.path.join("asyncio", "events.py")
+_LIBRARY_PATHS = tuple(
+    os.path.realpath(p) for p in {sysconfig.get_paths()["stdlib"], sysconfig.get_paths()["purelib"],
+                                  sysconfig.get_paths()["platlib"]}
+)
+
+_watchdogs: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LoopWatchdog]" = weakref.WeakKeyDictionary()
+
+
+def _capture(frame, depth: int) -> Tuple[Optional[str], traceback.StackSummary]:
+    """
+    The stack of whatever the loop is running, up to the loop's own dispatch of the
+    callback, and that callback when it is a plain one rather than a task step.
+    """
+    frames = []
+    callback = None
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == "_run" and code.co_filename.endswith(_DISPATCH_FILE):
+            callback = getattr(frame.f_locals.get("self"), "_callback", None)
+            break
+        frames.append(frame)
+        frame = frame.f_back
+    stack = traceback.StackSummary.extract(((f, f.f_lineno) for f in reversed(frames[:depth])), lookup_lines=True)
+    if callback is None or isinstance(getattr(callback, "__self__", None), asyncio.Task):
+        return None, stack
+    return getattr(callback, "__qualname__", repr(callback)), stack
+
+
+def _call_site(stack: traceback.StackSummary, callback: Optional[str]) -> str:
+    """The innermost frame outside the standard library and installed packages, else the innermost one."""
+    for frame in reversed(stack):
+        if not os.path.realpath(frame.filename).startswith(_LIBRARY_PATHS):
+            return f"{os.path.relpath(frame.filename)}:{frame.lineno} in {frame.name}"
+    if stack:
+        return f"{stack[-1].filename}:{stack[-1].lineno} in {stack[-1].name}"
+    # A C function scheduled directly on the loop, e.g. call_soon(time.sleep, 1)
+    return f"callback {callback}"
+
+
+class LoopWatchdog:
+    def __init__(self, loop: asyncio.AbstractEventLoop, threshold: float = 0.1, stack_depth: int = 12):
+        # Weak, so the registry entry and the watchdog thread don't keep a finished job's loop alive
+        self._loop = weakref.ref(loop)
+        self.threshold = threshold
+        self.stack_depth = stack_depth
+        # Beat often enough that a block is caught well before it reaches the threshold twice over
+        self.interval = threshold / 4
+        self._beats = 0
+        self._last_beat = time.monotonic()
+        # (beat number, task, stack, call site) captured during the block that follows that beat
+        self._captured: Optional[tuple] = None
+        self._loop_thread = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        # This loop's offenders, keyed by call site; every job runs on a loop of its own
+        self._offenders: Dict[str, Dict[str, Any]] = {}
+        self._offenders_lock = threading.Lock()
+
+    @property
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        return self._loop()
+
+    def start(self):
+        """Call from the loop's own thread."""
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self.loop.call_later(self.interval, self._beat)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        loop = self.loop
+        if loop is not None and _watchdogs.get(loop) is self:
+            del _watchdogs[loop]
+
+    def _beat(self):
+        now = time.monotonic()
+        lag = now - self._last_beat - self.interval
+        captured, beats = self._captured, self._beats
+        self._beats += 1
+        self._last_beat = now
+        if not self._stopped.is_set():
+            self.loop.call_later(self.interval, self._beat)
+        if lag >= self.threshold:
+            if captured is not None and captured[0] == beats:
+                self._record(*captured[1:], lag)
+            else:
+                # Blocked and resumed between two checks of the watchdog thread
+                self._record(None, None, "unknown (too short to capture)", lag)
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval):
+            loop = self.loop
+            if loop is None or loop.is_closed():
+                return
+            beats, last_beat = self._beats, self._last_beat
+            blocked_for = time.monotonic() - last_beat - self.interval
+            if blocked_for < self.threshold or not loop.is_running():
+                continue
+            if self._captured is not None and self._captured[0] == beats:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            callback, stack = _capture(frame, self.stack_depth)
+            task = _describe(asyncio.current_task(loop)) or f"callback {callback}"
+            site = _call_site(stack, callback)
+            self._captured = (beats, task, stack, site)
+            logger.warning(f"Event loop blocked for {blocked_for * 1000:.0f}ms+ in {task} at {site}")
+
+    def _record(self, task: Optional[str], stack: Optional[traceback.StackSummary], site: str, seconds: float):
+        metrics.LOOP_BLOCK_SECONDS.labels(site).observe(seconds)
+        with self._offenders_lock:
+            entry = self._offenders.setdefault(
+                site, {"site": site, "count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            if seconds >= entry["max_seconds"]:
+                entry["max_seconds"] = seconds
+                entry["task"] = task
+                entry["stack"] = traceback.format_list(stack) if stack else []
+
+    def worst_offenders(self, top: int = 5, reset: bool = False) -> List[Dict[str, Any]]:
+        """Call sites that blocked this loop, by total time blocked, with their worst stack; `reset` starts over."""
+        with self._offenders_lock:
+            entries = sorted(self._offenders.values(), key=lambda e: e["total_seconds"], reverse=True)[:top]
+            if reset:
+                self._offenders = {}
+        return [{**e, "total_seconds": round(e["total_seconds"], 4), "max_seconds": round(e["max_seconds"], 4)}
+                for e in entries]
+
+
+def _describe(task: Optional[asyncio.Task]) -> Optional[str]:
+    if task is None:
+        return None
+    coro = task.get_coro()
+    return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+
+def ensure_watchdog(threshold: float = 0.1) -> LoopWatchdog:
+    """Watch the running loop until it closes; one watchdog per loop, however often this is called."""
+    loop = asyncio.get_running_loop()
+    watchdog = _watchdogs.get(loop)
+    if watchdog is None:
+        watchdog = _watchdogs[loop] = LoopWatchdog(loop, threshold)
+        watchdog.start()
+    return watchdog
+
+
+def worst_offenders(top: int = 5, reset: bool = False) -> List[Dict[str, Any]]:
+    """The running loop's worst offenders (see `LoopWatchdog.worst_offenders`); none if it isn't watched."""
+    watchdog = _watchdogs.get(asyncio.get_running_loop())
+    return watchdog.worst_offenders(top, reset) if watchdog is not None else []
+
+
+def log_worst_offenders(top: int = 5, reset: bool = True):
+    """Log the running loop's worst offenders, by default starting over for the next session on it."""
+    for entry in worst_offenders(top, reset):
+        logger.warning(
+            f"Loop blocked {entry['count']}x for {entry['total_seconds']}s (worst {entry['max_seconds']}s) "
+            f"at {entry['site']}\n{''.join(entry['stack'])}"
+        )
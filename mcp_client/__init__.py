@@ -1 +1,5 @@
-from .server import MCPServer, MCPServerSse, MCPServerStdio, MCPServerSseParams, MCPServerStdioParams
\ No newline at end of file
+from .server import MCPServer, MCPServerSse, MCPServerStdio, MCPServerSseParams, MCPServerStdioParams
+from .pool import MCPServerPool, PooledMCPServer
+from .tool_cache import ToolSchemaStore, tools_hash
+from .resilience import CallGuard, CircuitBreaker, CircuitOpenError
+from .schema import ArgumentError, compile_validator, inline_refs, strict_schema
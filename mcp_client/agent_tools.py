@@ -2,18 +2,51 @@ import asyncio
 import logging
 import json
 import inspect
+import time
 import typing
+import weakref
 from typing import Any, List, Dict, Callable, Optional, Awaitable, Sequence, Tuple, Type, Union, cast
 from uuid import uuid4
 
 # Import from the MCP module
 from .util import MCPUtil, FunctionTool
 from .server import MCPServer, MCPServerSse
+from .tool_cache import tools_hash
+from .schema import ArgumentError, compile_validator, inline_refs, strict_schema
 from livekit.agents import ChatContext, AgentSession, JobContext, FunctionTool as Tool
 from mcp import CallToolRequest
 
 logger = logging.getLogger("mcp-agent-tools")
 
+# Decorated tools per call target, keyed by (schema hash, strict). Schema validators and
+# function_tool wrappers are only built once per distinct tools list.
+_compiled_tools: "weakref.WeakKeyDictionary[Any, Dict[Tuple[str, bool], List[Callable]]]" = weakref.WeakKeyDictionary()
+
+# Called as hook(event, name, seconds, ok) after every MCP "connect", "list_tools" and tool "call",
+# where name is the server or tool name, and with "call_started" (0 seconds) as a tool call begins;
+# every "call_started" is followed by its "call". A call whose arguments fail the tool's schema is
+# never sent and reports "rejected" instead. Hooks run inline, so they must be cheap.
+timing_hooks: List[Callable[[str, str, float, bool], None]] = []
+
+# Called as hook(tool_name, arguments, result, ok) after every MCP tool call that returned, so
+# local records (emails sent, say) can follow what the tools did. Hooks run inline, so they must be cheap.
+result_hooks: List[Callable[[str, Dict[str, Any], str, bool], None]] = []
+
+def _report_result(name: str, arguments: Dict[str, Any], result: str, ok: bool):
+    for hook in result_hooks:
+        try:
+            hook(name, arguments, result, ok)
+        except Exception as e:
+            logger.debug(f"Result hook failed for {name}: {e}")
+
+def _report_timing(event: str, name: str, started: float, ok: bool):
+    seconds = time.perf_counter() - started
+    for hook in timing_hooks:
+        try:
+            hook(event, name, seconds, ok)
+        except Exception as e:
+            logger.debug(f"Timing hook failed for {event} {name}: {e}")
+
 class MCPToolsIntegration:
     """
     Helper class for integrating MCP tools with LiveKit agents.
@@ -23,58 +56,98 @@ class MCPToolsIntegration:
     @staticmethod
     async def prepare_dynamic_tools(mcp_servers: List[MCPServer],
                                    convert_schemas_to_strict: bool = True,
-                                   auto_connect: bool = True) -> List[Callable]:
+                                   auto_connect: bool = True,
+                                   server_timeout: Optional[float] = None) -> List[Callable]:
         """
         Fetches tools from multiple MCP servers and prepares them for use with LiveKit agents.
 
+        Servers are connected and listed concurrently. Each one gets its own deadline and
+        failures are isolated, so a slow or broken server only loses its own tools.
+
         Args:
             mcp_servers: List of MCPServer instances
             convert_schemas_to_strict: Whether to convert JSON schemas to strict format
             auto_connect: Whether to automatically connect to servers if they're not connected
+            server_timeout: Seconds each server gets to connect and list its tools (None waits forever)
 
         Returns:
             List of decorated tool functions ready to be added to a LiveKit agent
         """
-        prepared_tools = []
+        results = await asyncio.gather(*(
+            MCPToolsIntegration._load_server_tools(server, convert_schemas_to_strict, auto_connect, server_timeout)
+            for server in mcp_servers
+        ))
+        return [tool for server_tools in results for tool in server_tools]
 
-        # Ensure all servers are connected if auto_connect is True
-        if auto_connect:
-            for server in mcp_servers:
-                if not getattr(server, 'connected', False):
-                    try:
-                        logger.debug(f"Auto-connecting to MCP server: {server.name}")
-                        await server.connect()
-                    except Exception as e:
-                        logger.error(f"Failed to connect to MCP server {server.name}: {e}")
-
-        # Process each server
-        for server in mcp_servers:
+    @staticmethod
+    async def _load_server_tools(server: MCPServer, convert_schemas_to_strict: bool, auto_connect: bool,
+                                 server_timeout: Optional[float]) -> List[Callable]:
+        """Connects (if needed) and compiles one server's tools within its deadline; never raises."""
+        async def _load():
+            if auto_connect and not getattr(server, 'connected', False):
+                logger.debug(f"Auto-connecting to MCP server: {server.name}")
+                started, ok = time.perf_counter(), False
+                try:
+                    await server.connect()
+                    ok = True
+                finally:
+                    _report_timing("connect", server.name, started, ok)
             logger.info(f"Fetching tools from MCP server: {server.name}")
+            return await MCPToolsIntegration._compile_server_tools(server, convert_schemas_to_strict)
+
+        try:
+            return await asyncio.wait_for(_load(), timeout=server_timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"MCP server {server.name} did not deliver its tools within {server_timeout}s")
+        except Exception as e:
+            logger.error(f"Failed to load tools from MCP server {server.name}: {e}")
+        return []
+
+    @staticmethod
+    async def _compile_server_tools(server: MCPServer, convert_schemas_to_strict: bool) -> List[Callable]:
+        """
+        Lists a server's tools and returns their decorated functions, reusing the ones
+        already compiled for the same call target and schema hash.
+        """
+        started, ok = time.perf_counter(), False
+        try:
+            mcp_tools = await server.list_tools()
+            ok = True
+        finally:
+            _report_timing("list_tools", server.name, started, ok)
+        logger.info(f"Received {len(mcp_tools)} tools from {server.name}")
+        schema_hash = getattr(server, "tools_hash", None) or tools_hash(mcp_tools)
+        # Pooled servers route calls through a target shared by the jobs of this process
+        target = getattr(server, "tool_call_target", server)
+        compiled = _compiled_tools.setdefault(target, {})
+        cache_key = (schema_hash, convert_schemas_to_strict)
+        if cache_key in compiled:
+            logger.debug(f"Reusing compiled tools for {server.name} (schema {schema_hash})")
+            return list(compiled[cache_key])
+
+        prepared_tools = []
+        for mcp_tool in mcp_tools:
             try:
-                mcp_tools = await MCPUtil.get_function_tools(
-                    server, convert_schemas_to_strict=convert_schemas_to_strict
-                )
-                logger.info(f"Received {len(mcp_tools)} tools from {server.name}")
+                tool_instance = MCPUtil.to_function_tool(mcp_tool, target, convert_schemas_to_strict)
+                prepared_tools.append(MCPToolsIntegration._create_decorated_tool(tool_instance))
+                logger.debug(f"Successfully prepared tool: {tool_instance.name}")
             except Exception as e:
-                logger.error(f"Failed to fetch tools from {server.name}: {e}")
-                continue
+                logger.error(f"Failed to prepare tool '{mcp_tool.name}': {e}")
 
-            # Process each tool from this server
-            for tool_instance in mcp_tools:
-                try:
-                    decorated_tool = MCPToolsIntegration._create_decorated_tool(tool_instance)
-                    prepared_tools.append(decorated_tool)
-                    logger.debug(f"Successfully prepared tool: {tool_instance.name}")
-                except Exception as e:
-                    logger.error(f"Failed to prepare tool '{tool_instance.name}': {e}")
-
-        return prepared_tools
+        # Tools compiled for an outdated schema are never handed out again
+        compiled.clear()
+        compiled[cache_key] = prepared_tools
+        return list(prepared_tools)
 
     @staticmethod
     def _create_decorated_tool(tool: FunctionTool) -> Callable:
         """
         Creates a decorated function for a single MCP tool that can be used with LiveKit agents.
 
+        The tool's input schema is handed to the model as it is (or its strict form) and
+        compiled once into a validator; arguments that don't match it are answered with
+        the errors straight away instead of being sent to the server.
+
         Args:
             tool: The FunctionTool instance to convert
 
@@ -85,52 +158,48 @@ class MCPToolsIntegration:
         # Import locally to avoid circular imports
         from livekit.agents.llm import function_tool
 
-        # Create parameters list from JSON schema
-        params = []
-        annotations = {}
-        schema_props = tool.params_json_schema.get("properties", {})
-        schema_required = set(tool.params_json_schema.get("required", []))
-        type_map = {
-            "string": str, "integer": int, "number": float,
-            "boolean": bool, "array": list, "object": dict,
-        }
-
-        # Build parameters from the schema properties
-        for p_name, p_details in schema_props.items():
-            json_type = p_details.get("type", "string")
-            py_type = type_map.get(json_type, typing.Any)
-            annotations[p_name] = py_type
-
-            # Use inspect.Parameter.empty for required params, None otherwise
-            default = inspect.Parameter.empty if p_name in schema_required else p_details.get("default", None)
-            params.append(inspect.Parameter(
-                name=p_name,
-                kind=inspect.Parameter.KEYWORD_ONLY,
-                annotation=py_type,
-                default=default
-            ))
+        # Validates against the schema the server declared; nulls the strict form allows are dropped
+        validate = compile_validator(tool.params_json_schema)
+        parameters = inline_refs(strict_schema(tool.params_json_schema) if tool.strict_json_schema
+                                 else (tool.params_json_schema or {"type": "object", "properties": {}}))
 
         # Define the actual function that will be called by the agent
-        async def tool_impl(**kwargs):
-            input_json = json.dumps(kwargs)
+        async def tool_impl(raw_arguments: Dict[str, Any]):
+            started = time.perf_counter()
+            try:
+                kwargs = validate(raw_arguments)
+            except ArgumentError as e:
+                _report_timing("rejected", tool.name, started, False)
+                logger.info(f"Rejected call to '{tool.name}' with args {raw_arguments}: {e}")
+                return (f"Error: invalid arguments for '{tool.name}', nothing was sent: "
+                        f"{'; '.join(e.errors)}. Fix them and call it again.")
             logger.info(f"Invoking tool '{tool.name}' with args: {kwargs}")
-            result_str = await tool.on_invoke_tool(None, input_json)
-            logger.info(f"Tool '{tool.name}' result: {result_str}")
+            started, ok = time.perf_counter(), False
+            _report_timing("call_started", tool.name, time.perf_counter(), True)
+            try:
+                result_str = await tool.on_invoke_tool(None, kwargs)
+                # Failures come back as "Error..." strings for the model rather than as exceptions
+                ok = not result_str.startswith("Error")
+                _report_result(tool.name, kwargs, result_str, ok)
+            finally:
+                _report_timing("call", tool.name, started, ok)
+            logger.info(f"Tool '{tool.name}' returned {len(result_str)} chars: {result_str[:200]}")
             return result_str
 
         # Set function metadata
-        tool_impl.__signature__ = inspect.Signature(parameters=params)
         tool_impl.__name__ = tool.name
         tool_impl.__doc__ = tool.description
-        tool_impl.__annotations__ = {'return': str, **annotations}
 
         # Apply the decorator and return
-        return function_tool()(tool_impl)
+        return function_tool(
+            raw_schema={"name": tool.name, "description": tool.description or "", "parameters": parameters}
+        )(tool_impl)
 
     @staticmethod
     async def register_with_agent(agent, mcp_servers: List[MCPServer],
                                  convert_schemas_to_strict: bool = True,
-                                 auto_connect: bool = True) -> List[Callable]:
+                                 auto_connect: bool = True,
+                                 server_timeout: Optional[float] = None) -> List[Callable]:
         """
         Helper method to prepare and register MCP tools with a LiveKit agent.
 
@@ -139,6 +208,7 @@ class MCPToolsIntegration:
             mcp_servers: List of MCPServer instances
             convert_schemas_to_strict: Whether to convert schemas to strict format
             auto_connect: Whether to auto-connect to servers
+            server_timeout: Seconds each server gets to connect and list its tools
 
         Returns:
             List of tool functions that were registered
@@ -147,26 +217,69 @@ class MCPToolsIntegration:
         tools = await MCPToolsIntegration.prepare_dynamic_tools(
             mcp_servers,
             convert_schemas_to_strict=convert_schemas_to_strict,
-            auto_connect=auto_connect
+            auto_connect=auto_connect,
+            server_timeout=server_timeout
         )
 
         # Register with the agent
-        if hasattr(agent, '_tools') and isinstance(agent._tools, list):
-            agent._tools.extend(tools)
-            logger.info(f"Registered {len(tools)} MCP tools with agent")
-
-            # Log the names of registered tools
-            if tools:
-                tool_names = [getattr(t, '__name__', 'unknown') for t in tools]
-                logger.info(f"Registered tool names: {tool_names}")
-        else:
-            logger.warning("Agent does not have a '_tools' attribute, tools were not registered")
-
+        if tools:
+            tool_names = await MCPToolsIntegration._add_tools(agent, tools)
+            logger.info(f"Registered {len(tools)} MCP tools with agent: {tool_names}")
         return tools
 
+    @staticmethod
+    async def _add_tools(agent, tools: List[Callable]) -> List[str]:
+        """Adds tools through Agent.update_tools, replacing attached ones of the same name; returns their names."""
+        names = {getattr(t, '__name__', None) for t in tools}
+        kept = [t for t in agent.tools if getattr(t, '__name__', None) not in names]
+        await agent.update_tools(kept + tools)
+        return sorted(name for name in names if name)
+
+    @staticmethod
+    def attach_tools_in_background(agent, mcp_servers: List[MCPServer],
+                                   convert_schemas_to_strict: bool = True,
+                                   server_timeout: Optional[float] = None) -> asyncio.Task:
+        """
+        Loads tools from every MCP server concurrently and hot-attaches each server's tools
+        to an agent as soon as they are ready, so a session can start with its local tools
+        and never wait on an MCP server.
+
+        Tools are added through Agent.update_tools, which also pushes them to a running
+        realtime session. A tool with the same name as an attached one replaces it.
+
+        Args:
+            agent: The LiveKit agent instance, started or not
+            mcp_servers: List of MCPServer instances
+            convert_schemas_to_strict: Whether to convert schemas to strict format
+            server_timeout: Seconds each server gets to connect and list its tools
+
+        Returns:
+            The background task; it finishes once every server has attached or given up
+        """
+        update_lock = asyncio.Lock()
+
+        async def _attach(server: MCPServer):
+            tools = await MCPToolsIntegration._load_server_tools(
+                server, convert_schemas_to_strict, True, server_timeout
+            )
+            if not tools:
+                return
+            try:
+                async with update_lock:
+                    names = await MCPToolsIntegration._add_tools(agent, tools)
+                logger.info(f"Hot-attached {len(tools)} MCP tools from {server.name}: {names}")
+            except Exception as e:
+                logger.error(f"Failed to attach tools from {server.name}: {e}")
+
+        async def _attach_all():
+            await asyncio.gather(*(_attach(server) for server in mcp_servers))
+
+        return asyncio.create_task(_attach_all(), name="mcp-hot-attach")
+
     @staticmethod
     async def create_agent_with_tools(agent_class, mcp_servers: List[MCPServer], agent_kwargs: Dict = None,
-                                    convert_schemas_to_strict: bool = True) -> Any:
+                                    convert_schemas_to_strict: bool = True,
+                                    server_timeout: Optional[float] = None) -> Any:
         """
         Factory method to create and initialize an agent with MCP tools already loaded.
 
@@ -175,42 +288,28 @@ class MCPToolsIntegration:
             mcp_servers: List of MCP servers to register with the agent
             agent_kwargs: Additional keyword arguments to pass to the agent constructor
             convert_schemas_to_strict: Whether to convert JSON schemas to strict format
+            server_timeout: Seconds each server gets to connect and list its tools
 
         Returns:
             An initialized agent instance with MCP tools registered
         """
-        # Connect to MCP servers
-        for server in mcp_servers:
-            if not getattr(server, 'connected', False):
-                try:
-                    logger.debug(f"Connecting to MCP server: {server.name}")
-                    await server.connect()
-                except Exception as e:
-                    logger.error(f"Failed to connect to MCP server {server.name}: {e}")
-
-        # Create agent instance
-        agent_kwargs = agent_kwargs or {}
-        agent = agent_class(**agent_kwargs)
-
-        # Prepare tools
+        # Connect and list every server concurrently, each within its own deadline
         tools = await MCPToolsIntegration.prepare_dynamic_tools(
             mcp_servers,
             convert_schemas_to_strict=convert_schemas_to_strict,
-            auto_connect=False  # Already connected above
+            auto_connect=True,
+            server_timeout=server_timeout
         )
 
-        # Register tools with agent
-        if tools and hasattr(agent, '_tools') and isinstance(agent._tools, list):
-            agent._tools.extend(tools)
-            logger.info(f"Registered {len(tools)} MCP tools with agent")
+        # Create agent instance
+        agent_kwargs = agent_kwargs or {}
+        agent = agent_class(**agent_kwargs)
 
-            # Log the names of registered tools
-            tool_names = [getattr(t, '__name__', 'unknown') for t in tools]
-            logger.info(f"Registered tool names: {tool_names}")
+        # Register tools with agent
+        if tools:
+            tool_names = await MCPToolsIntegration._add_tools(agent, tools)
+            logger.info(f"Registered {len(tools)} MCP tools with agent: {tool_names}")
         else:
-            if not tools:
-                logger.warning("No tools were found to register with the agent")
-            else:
-                logger.warning("Agent does not have a '_tools' attribute, tools were not registered")
+            logger.warning("No tools were found to register with the agent")
 
         return agent
@@ -0,0 +1,306 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from mcp.types import CallToolResult, Tool as MCPTool
+
+from .server import MCPServer, _MCPServerWithClientSession
+
+logger = logging.getLogger("mcp-pool")
+
+
+class _PoolSlot:
+    """One pooled connection, owned by the pool's maintenance task for that slot."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.server: Optional[_MCPServerWithClientSession] = None
+        self.ready = asyncio.Event()
+        self.leases = 0
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+        self.connected_at: Optional[float] = None
+
+
+class MCPServerPool:
+    """
+    Pool of live MCP client sessions, per process, that jobs lease instead of
+    opening their own.
+
+    The sessions live on a dedicated event loop thread, so they outlive a job's
+    own loop and can be shared by jobs running on other loops of the same
+    process. That sharing only happens with the thread executor: the process
+    executor runs one job per process and exits the process with it, so there
+    the pool is a pre-connect for that one job and a single slot is enough.
+    Each slot is kept connected by its own task: it connects with exponential
+    backoff, pings the server periodically and reconnects as soon as the
+    connection drops (e.g. a stdio server process exits) or a ping fails.
+
+    Tool calls never wait for a session to come back: with none healthy they
+    fail at once, and count as a failure of the servers' call guard, so its
+    circuit breaker opens while the backend is down.
+    """
+
+    def __init__(self, server_factory: Callable[[], _MCPServerWithClientSession], size: int = 1,
+                 health_check_interval: float = 30.0, health_check_timeout: float = 5.0,
+                 initial_backoff: float = 0.5, max_backoff: float = 30.0):
+        """
+        Args:
+            server_factory: Creates a new, unconnected server instance for a slot.
+            size: Number of live sessions kept open.
+            health_check_interval: Seconds between pings of each session.
+            health_check_timeout: Seconds a ping may take before the session is recycled.
+            initial_backoff: First delay before reconnecting after a failure.
+            max_backoff: Upper bound for the reconnect delay.
+        """
+        self._factory = server_factory
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        self._slots: List[_PoolSlot] = []
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._closing = False
+        # An unconnected server from the factory, for the name and call guard every slot shares
+        self._template: Optional[_MCPServerWithClientSession] = None
+
+    @property
+    def name(self) -> str:
+        if self._template is None:
+            self._template = self._factory()
+        return self._template.name
+
+    @property
+    def call_guard(self):
+        if self._template is None:
+            self._template = self._factory()
+        return getattr(self._template, "call_guard", None)
+
+    def start(self):
+        """Start the pool thread and begin warming every slot. Safe to call repeatedly."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self._loop = loop
+            self._thread = threading.Thread(target=run, name="mcp-pool", daemon=True)
+            self._thread.start()
+            ready.wait()
+            asyncio.run_coroutine_threadsafe(self._start_slots(), loop).result()
+            logger.info(f"Warming MCP pool for {self.name} with {self.size} session(s)")
+
+    async def _start_slots(self):
+        for i in range(self.size):
+            slot = _PoolSlot(i)
+            self._slots.append(slot)
+            self._tasks.append(asyncio.create_task(self._maintain(slot), name=f"mcp-pool-slot-{i}"))
+
+    async def _maintain(self, slot: _PoolSlot):
+        backoff = self.initial_backoff
+        while not self._closing:
+            server = self._factory()
+            try:
+                await server.connect()
+            except Exception as e:
+                slot.last_error = str(e)
+                logger.warning(f"MCP pool slot {slot.index} failed to connect, retrying in {backoff:.1f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            slot.server = server
+            slot.connected_at = time.time()
+            slot.ready.set()
+            try:
+                while not self._closing:
+                    if await server.wait_disconnected(self.health_check_interval):
+                        raise ConnectionError("connection closed")
+                    await asyncio.wait_for(server.session.send_ping(), timeout=self.health_check_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                slot.last_error = str(e) or type(e).__name__
+                slot.reconnects += 1
+                logger.warning(f"MCP pool slot {slot.index} failed its health check, reconnecting: {slot.last_error}")
+            finally:
+                uptime = time.time() - slot.connected_at
+                slot.ready.clear()
+                slot.server = None
+                slot.connected_at = None
+                await server.cleanup()
+            # A server that dies right after starting keeps backing off instead of respawning in a tight loop
+            if uptime < self.max_backoff:
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            else:
+                backoff = self.initial_backoff
+
+    async def _acquire(self, timeout: Optional[float]) -> _PoolSlot:
+        """Runs on the pool loop: wait for a healthy slot and lease the least used one."""
+        slot = await self._pick(timeout)
+        slot.leases += 1
+        return slot
+
+    async def _pick(self, timeout: Optional[float]) -> _PoolSlot:
+        """Runs on the pool loop: the least leased healthy slot, waiting for one if none is up."""
+        healthy = [slot for slot in self._slots if slot.ready.is_set()]
+        if not healthy:
+            waiters = [asyncio.create_task(slot.ready.wait()) for slot in self._slots]
+            try:
+                await asyncio.wait_for(asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED), timeout=timeout)
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
+            healthy = [slot for slot in self._slots if slot.ready.is_set()]
+            if not healthy:
+                raise RuntimeError(f"No healthy MCP session available for {self.name}")
+        return min(healthy, key=lambda s: s.leases)
+
+    def _ready_server(self, preferred: Optional[_PoolSlot] = None) -> _MCPServerWithClientSession:
+        """
+        Runs on the pool loop: the preferred slot's live server, else the least leased
+        healthy one. Never waits; with no healthy session the call fails right away.
+        """
+        if preferred is not None and preferred.ready.is_set():
+            return preferred.server
+        healthy = [slot for slot in self._slots if slot.ready.is_set()]
+        if healthy:
+            return min(healthy, key=lambda s: s.leases).server
+        last_error = next((slot.last_error for slot in self._slots if slot.last_error), None)
+        error = ConnectionError(
+            f"No healthy MCP session for {self.name}" + (f" (last error: {last_error})" if last_error else "")
+        )
+        guard = self.call_guard
+        if guard is not None:
+            # The call never reached the guard; count it, so the breaker opens while the backend is down
+            guard.breaker.record_failure(error)
+        raise error
+
+    async def _release(self, slot: _PoolSlot):
+        slot.leases = max(slot.leases - 1, 0)
+
+    async def _server_for(self, slot: _PoolSlot, timeout: Optional[float]) -> _MCPServerWithClientSession:
+        """Runs on the pool loop: the slot's live server, waiting out a reconnect if needed."""
+        if not slot.ready.is_set():
+            await asyncio.wait_for(slot.ready.wait(), timeout=timeout)
+        return slot.server
+
+    async def _run(self, coro):
+        """Run a coroutine on the pool loop and await it from the caller's loop."""
+        if self._loop is None:
+            self.start()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    async def call_tool(self, tool_name: str, arguments: Optional[Dict[str, Any]] = None) -> CallToolResult:
+        """Call a tool on any healthy session. Tools compiled against the pool are shared by its jobs."""
+
+        async def _call():
+            return await self._ready_server().call_tool(tool_name, arguments)
+
+        return await self._run(_call())
+
+    def server(self, acquire_timeout: float = 10.0) -> "PooledMCPServer":
+        """Create an MCPServer handle for one job; `connect()` leases a session."""
+        return PooledMCPServer(self, acquire_timeout=acquire_timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "size": self.size,
+            "healthy": sum(1 for slot in self._slots if slot.ready.is_set()),
+            "slots": [
+                {"leases": slot.leases, "reconnects": slot.reconnects, "healthy": slot.ready.is_set(),
+                 "connected_at": slot.connected_at, "last_error": slot.last_error}
+                for slot in self._slots
+            ],
+        }
+
+    async def aclose(self):
+        """Close every session and stop the pool thread."""
+        if self._loop is None:
+            return
+        self._closing = True
+
+        async def _shutdown():
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        await self._run(_shutdown())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = self._thread = None
+        self._slots, self._tasks = [], []
+        self._closing = False
+
+
+class PooledMCPServer(MCPServer):
+    """MCPServer handle backed by a leased session from an MCPServerPool."""
+
+    def __init__(self, pool: MCPServerPool, acquire_timeout: float = 10.0):
+        self._pool = pool
+        self._slot: Optional[_PoolSlot] = None
+        self.acquire_timeout = acquire_timeout
+        self.tools_hash: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return self._pool.name
+
+    @property
+    def connected(self) -> bool:
+        return self._slot is not None
+
+    @property
+    def tool_call_target(self) -> MCPServerPool:
+        """Compiled tools call through the pool, so they can be reused by later jobs."""
+        return self._pool
+
+    async def connect(self):
+        """Lease a live session from the pool; no handshake happens here."""
+        if self._slot is None:
+            self._slot = await self._pool._run(self._pool._acquire(self.acquire_timeout))
+
+    async def list_tools(self) -> List[MCPTool]:
+        slot = self._slot
+        if slot is None:
+            raise RuntimeError("Server not initialized. Make sure you call connect() first.")
+
+        async def _list():
+            server = await self._pool._server_for(slot, self.acquire_timeout)
+            tools = await server.list_tools()
+            self.tools_hash = server.tools_hash
+            return tools
+
+        return await self._pool._run(_list())
+
+    async def call_tool(self, tool_name: str, arguments: Optional[Dict[str, Any]] = None) -> CallToolResult:
+        slot = self._slot
+        if slot is None:
+            raise RuntimeError("Server not initialized. Make sure you call connect() first.")
+
+        async def _call():
+            # A leased slot that is reconnecting hands the call to another session, or fails it at once
+            return await self._pool._ready_server(slot).call_tool(tool_name, arguments)
+
+        return await self._pool._run(_call())
+
+    async def cleanup(self):
+        """Return the lease; the session itself stays open for the next job."""
+        slot, self._slot = self._slot, None
+        if slot is not None:
+            await self._pool._run(self._pool._release(slot))
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger("mcp-resilience")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without contacting the server while its circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker. After `failure_threshold` consecutive failures the
+    circuit opens and calls fail fast with the last error; once `recovery_timeout`
+    has passed a single probe call is let through (half-open) and its outcome
+    closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error: Optional[str] = None
+        self._probing = False
+
+    def _open_error(self) -> CircuitOpenError:
+        if self.state == "half_open":
+            return CircuitOpenError(f"{self.name} is unavailable (last error: {self.last_error}); recovery probe in progress")
+        retry_in = max(self.recovery_timeout - (time.monotonic() - self.opened_at), 0.0)
+        return CircuitOpenError(
+            f"{self.name} is unavailable (last error: {self.last_error}); not retrying for {retry_in:.0f}s"
+        )
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call must not reach the server."""
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                raise self._open_error()
+            self.state = "half_open"
+            logger.info(f"Circuit for {self.name} half-open, probing")
+        if self.state == "half_open":
+            if self._probing:
+                raise self._open_error()
+            self._probing = True
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info(f"Circuit for {self.name} closed")
+        self.state, self.failures, self._probing = "closed", 0, False
+
+    def record_failure(self, error: BaseException):
+        self.failures += 1
+        self.last_error = str(error) or type(error).__name__
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failures: {self.last_error}")
+            self.state, self.opened_at = "open", time.monotonic()
+        self._probing = False
+
+    def release_probe(self):
+        """A probe that ended without an outcome (e.g. cancelled) frees the half-open slot."""
+        self._probing = False
+
+
+class CallGuard:
+    """
+    Concurrency limits, deadlines and a circuit breaker around a server's tool calls.
+
+    One guard is meant to be shared by every connection to the same backend, so the
+    limits hold per server no matter how many sessions are pooled.
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 8, tool_concurrency: Optional[int] = None,
+                 call_timeout: float = 15.0, tool_limits: Optional[Dict[str, Dict[str, Any]]] = None,
+                 failure_threshold: int = 5, recovery_timeout: float = 30.0, max_queue: Optional[int] = None):
+        """
+        Args:
+            name: Server name used in errors and logs.
+            max_concurrency: Maximum tool calls in flight against the server.
+            tool_concurrency: Default maximum in-flight calls per tool (None = only the server limit).
+            call_timeout: Default deadline in seconds for a call, including time spent queued.
+            tool_limits: Per-tool overrides, e.g. {"send_email": {"concurrency": 1, "timeout": 30}}.
+            failure_threshold: Consecutive failures that open the circuit.
+            recovery_timeout: Seconds the circuit stays open before a probe call is allowed.
+            max_queue: Maximum calls waiting for a slot; beyond that calls are rejected at once
+            (None = bounded only by the call deadline).
+        """
+        self.name = name
+        self.call_timeout = call_timeout
+        self.tool_concurrency = tool_concurrency
+        self.tool_limits = tool_limits or {}
+        self.max_queue = max_queue
+        self._queued = 0
+        self.breaker = CircuitBreaker(name, failure_threshold, recovery_timeout)
+        self._server_slots = asyncio.Semaphore(max_concurrency)
+        self._tool_slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _tool_semaphore(self, tool_name: str) -> Optional[asyncio.Semaphore]:
+        limit = self.tool_limits.get(tool_name, {}).get("concurrency", self.tool_concurrency)
+        if not limit:
+            return None
+        if tool_name not in self._tool_slots:
+            self._tool_slots[tool_name] = asyncio.Semaphore(limit)
+        return self._tool_slots[tool_name]
+
+    async def run(self, tool_name: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `call` within the limits; raises CircuitOpenError or TimeoutError instead of waiting."""
+        if self.max_queue is not None and self._queued >= self.max_queue:
+            raise TimeoutError(f"'{tool_name}' on {self.name} is busy; {self._queued} calls already queued")
+        self.breaker.before_call()
+        timeout = self.tool_limits.get(tool_name, {}).get("timeout", self.call_timeout)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        acquired = []
+        settled = False
+        try:
+            for semaphore in (self._tool_semaphore(tool_name), self._server_slots):
+                if semaphore is None:
+                    continue
+                self._queued += 1
+                try:
+                    await asyncio.wait_for(semaphore.acquire(), timeout=max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    # Our own queue is full; that says nothing about the backend's health
+                    raise TimeoutError(f"'{tool_name}' on {self.name} is busy; no call slot within {timeout}s")
+                finally:
+                    self._queued -= 1
+                acquired.append(semaphore)
+            try:
+                result = await asyncio.wait_for(call(), timeout=max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                error = TimeoutError(f"'{tool_name}' on {self.name} timed out after {timeout}s")
+                self.breaker.record_failure(error)
+                settled = True
+                raise error
+            except Exception as e:
+                self.breaker.record_failure(e)
+                settled = True
+                raise
+            self.breaker.record_success()
+            settled = True
+            return result
+        finally:
+            for semaphore in acquired:
+                semaphore.release()
+            if not settled:
+                self.breaker.release_probe()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.breaker.state, "failures": self.breaker.failures, "last_error": self.breaker.last_error,
+                "queued": self._queued}
@@ -0,0 +1,196 @@
+"""
+JSON Schema handling for MCP tool arguments. Each input schema is compiled once into
+a jsonschema validator, so a malformed call from the model is rejected on our side,
+with errors it can act on, instead of after a round trip to the server. `strict_schema`
+derives the schema the model is given when tools are converted to strict mode.
+"""
+import copy
+import difflib
+import functools
+import json
+import logging
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from jsonschema import exceptions as jsonschema_errors
+from jsonschema.validators import validator_for
+from referencing import Registry
+from referencing.exceptions import Unresolvable
+
+logger = logging.getLogger("mcp-client")
+
+
+class ArgumentError(ValueError):
+    """Arguments that don't match a tool's input schema; `errors` has one entry per problem."""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__("; ".join(errors))
+
+
+def _where(path) -> str:
+    where = ""
+    for part in path:
+        where += f"[{part}]" if isinstance(part, int) else f".{part}" if where else str(part)
+    return where or "arguments"
+
+
+def _resolve(root: Dict[str, Any], ref: str) -> Any:
+    if not ref.startswith("#"):
+        raise ValueError(f"Only local $refs are supported, not '{ref}'")
+    node: Any = root
+    for part in filter(None, ref[1:].split("/")):
+        node = node[part.replace("~1", "/").replace("~0", "~")]
+    return node
+
+
+def _describe(error: jsonschema_errors.ValidationError) -> List[str]:
+    """The model-facing messages for one validation error, with a hint where one helps."""
+    where = _where(error.absolute_path)
+    if error.validator == "additionalProperties" and error.validator_value is False and isinstance(error.instance, dict):
+        known = list(error.schema.get("properties", {}))
+        patterns = [re.compile(p) for p in error.schema.get("patternProperties", {})]
+        messages = []
+        for key in error.instance:
+            if key in known or any(p.search(key) for p in patterns):
+                continue
+            close = difflib.get_close_matches(key, known, n=1)
+            hint = f"did you mean '{close[0]}'?" if close else \
+                f"expected one of {', '.join(known)}" if known else "no other fields are allowed"
+            messages.append(f"{where}: unknown field '{key}'; {hint}")
+        return messages or [f"{where}: {error.message}"]
+    if error.validator == "enum" and isinstance(error.instance, str):
+        close = difflib.get_close_matches(error.instance, [o for o in error.validator_value if isinstance(o, str)], n=1)
+        if close:
+            return [f"{where}: {error.message}; did you mean {json.dumps(close[0])}?"]
+    if error.validator in ("anyOf", "oneOf") and error.context:
+        closest = jsonschema_errors.best_match(error.context)
+        return [f"{where}: {error.message}; closest: {_describe(closest)[0]}"]
+    return [f"{where}: {error.message}"]
+
+
+def _drop_nulls(validator, value: Any, schema: Any) -> Any:
+    """`value` without the nulls given for optional fields whose schema doesn't take null."""
+    if not isinstance(schema, dict):
+        return value
+    if isinstance(schema.get("$ref"), str) and schema["$ref"].startswith("#"):
+        schema = _resolve(validator.schema, schema["$ref"])
+    if isinstance(value, dict):
+        properties, required = schema.get("properties", {}), set(schema.get("required", ()))
+        result = {}
+        for key, item in value.items():
+            sub = properties.get(key)
+            if sub is None:
+                result[key] = item
+            # Strict schemas make optional fields nullable; null there means "left out"
+            elif item is None and key not in required and not validator.evolve(schema=sub).is_valid(None):
+                continue
+            else:
+                result[key] = _drop_nulls(validator, item, sub)
+        return result
+    if isinstance(value, list) and isinstance(schema.get("items"), dict):
+        return [_drop_nulls(validator, item, schema["items"]) for item in value]
+    return value
+
+
+@functools.lru_cache(maxsize=512)
+def _compiled(canonical: str) -> Callable[[Any], Any]:
+    schema = json.loads(canonical)
+    cls = validator_for(schema)
+    try:
+        cls.check_schema(schema)
+    except jsonschema_errors.SchemaError as e:
+        # The server is the judge of a schema we can't read
+        logger.warning(f"Not validating arguments against an invalid tool schema: {e.message}")
+        return lambda arguments: arguments
+    # An empty registry: a $ref to another document is never fetched from inside a voice turn
+    validator = cls(schema, registry=Registry(), format_checker=cls.FORMAT_CHECKER)
+
+    def validate(arguments: Any) -> Any:
+        arguments = _drop_nulls(validator, arguments, schema)
+        try:
+            found = sorted(validator.iter_errors(arguments), key=lambda e: list(e.absolute_path))
+        except Unresolvable as e:
+            logger.warning(f"Not validating arguments against a tool schema with an unresolvable $ref: {e}")
+            return arguments
+        errors = [message for error in found for message in _describe(error)]
+        if errors:
+            raise ArgumentError(errors)
+        return arguments
+    return validate
+
+
+def compile_validator(schema: Optional[Dict[str, Any]]) -> Callable[[Any], Any]:
+    """
+    A validator for `schema`, compiled once per distinct schema. It returns the arguments
+    ready to send (nulls for optional fields dropped) or raises ArgumentError listing every
+    problem, each with its path.
+    """
+    return _compiled(json.dumps(schema or {"type": "object"}, sort_keys=True))
+
+
+def _inline(schema: Any, root: Dict[str, Any], stack: tuple) -> Any:
+    if isinstance(schema, list):
+        return [_inline(sub, root, stack) for sub in schema]
+    if not isinstance(schema, dict):
+        return schema
+    ref = schema.get("$ref")
+    if isinstance(ref, str) and ref.startswith("#"):
+        siblings = {k: v for k, v in schema.items() if k != "$ref"}
+        if ref in stack:
+            # The model can't be given an infinite schema; below this depth the object is free-form
+            return {"type": "object", **{k: v for k, v in siblings.items() if k == "description"}}
+        return {**_inline(_resolve(root, ref), root, stack + (ref,)), **siblings}
+    return {key: _inline(value, root, stack) for key, value in schema.items() if key not in ("$defs", "definitions")}
+
+
+def inline_refs(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """A copy of `schema` with its local $refs expanded, for models that don't follow them."""
+    return _inline(schema, schema, ())
+
+
+def _accepts_null(schema: Dict[str, Any]) -> bool:
+    types = schema.get("type")
+    if schema.get("nullable") or types == "null" or (isinstance(types, list) and "null" in types):
+        return True
+    return any(_accepts_null(s) for s in schema.get("anyOf", ()) if isinstance(s, dict))
+
+
+def _make_strict(schema: Any) -> Any:
+    if not isinstance(schema, dict):
+        return schema
+    for keyword in ("$defs", "definitions"):
+        for sub in schema.get(keyword, {}).values():
+            _make_strict(sub)
+    for keyword in ("anyOf", "oneOf", "allOf", "prefixItems"):
+        for sub in schema.get(keyword, ()):
+            _make_strict(sub)
+    items = schema.get("items")
+    for sub in items if isinstance(items, list) else [items]:
+        _make_strict(sub)
+    if isinstance(schema.get("additionalProperties"), dict):
+        _make_strict(schema["additionalProperties"])
+
+    properties = schema.get("properties")
+    # A free-form object (no properties declared) stays open; closing it would make it always empty
+    if properties:
+        required = set(schema.get("required", ()))
+        for name, sub in properties.items():
+            _make_strict(sub)
+            if name not in required and isinstance(sub, dict) and not _accepts_null(sub):
+                properties[name] = {"anyOf": [sub, {"type": "null"}]}
+        schema["required"] = list(properties)
+        schema["additionalProperties"] = False
+    return schema
+
+
+def strict_schema(schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    A strict-mode copy of `schema`: every object with declared properties is closed and
+    requires all of them, and fields that were optional accept null instead, which the
+    validator treats as left out.
+    """
+    strict = _make_strict(copy.deepcopy(schema or {"type": "object"}))
+    strict.setdefault("type", "object")
+    strict.setdefault("properties", {})
+    return strict
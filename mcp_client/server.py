@@ -4,12 +4,17 @@ from typing import Any, Dict, List, Optional, Tuple
 import logging
 
 # Import from the installed mcp package
+import anyio
 from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
 import mcp.types
 from mcp.types import CallToolResult, JSONRPCMessage, Tool as MCPTool
 from mcp.client.sse import sse_client
+from mcp.client.stdio import StdioServerParameters, stdio_client
 from mcp.client.session import ClientSession
 
+from .resilience import CallGuard
+from .tool_cache import ToolSchemaStore, tools_hash
+
 # Base class for MCP servers
 class MCPServer:
     async def connect(self):
@@ -37,25 +42,43 @@ class MCPServer:
 class _MCPServerWithClientSession(MCPServer):
     """Base class for MCP servers that use a ClientSession to communicate with the server."""
 
-    def __init__(self, cache_tools_list: bool):
+    def __init__(self, cache_tools_list: bool, tools_store: Optional[ToolSchemaStore] = None,
+                 call_guard: Optional[CallGuard] = None):
         """
         Args:
             cache_tools_list: Whether to cache the tools list. If True, the tools list will be
-            cached and only fetched from the server once. If False, the tools list will be
-            fetched from the server on each call to list_tools(). You should set this to True
-            if you know the server will not change its tools list, because it can drastically
-            improve latency.
+            cached and only refetched when the server sends a tools/list_changed notification.
+            If False, the tools list will be fetched from the server on each call to list_tools().
+            tools_store: Optional on-disk store for the cached tools list. A new connection then
+            serves the persisted list immediately and revalidates it in the background.
+            call_guard: Optional concurrency limits, deadlines and circuit breaker for call_tool.
+            Share one guard between connections to the same backend.
         """
         self.session: Optional[ClientSession] = None
         self.exit_stack: AsyncExitStack = AsyncExitStack()
         self._cleanup_lock: asyncio.Lock = asyncio.Lock()
+        self._connection_task: Optional[asyncio.Task] = None
+        self._close_event: Optional[asyncio.Event] = None
         self.cache_tools_list = cache_tools_list
 
         # The cache is always dirty at startup, so that we fetch tools at least once
         self._cache_dirty = True
         self._tools_list: Optional[List[MCPTool]] = None
+        self.tools_hash: Optional[str] = None
+        self._tools_store = tools_store if cache_tools_list else None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.call_guard = call_guard
         self.logger = logging.getLogger(__name__)
 
+    @property
+    def tools_cache_key(self) -> Optional[str]:
+        """Key identifying this server's tools list in the on-disk store, or None to skip it."""
+        return None
+
+    @property
+    def connected(self) -> bool:
+        return self.session is not None
+
     def create_streams(
         self,
     ) -> AbstractAsyncContextManager[
@@ -78,49 +101,157 @@ class _MCPServerWithClientSession(MCPServer):
         """Invalidate the tools cache."""
         self._cache_dirty = True
 
-    async def connect(self):
-        """Connect to the server."""
+    async def _handle_message(self, message: Any):
+        """ClientSession message handler: refetch the tools list when the server says it changed."""
+        if isinstance(message, mcp.types.ServerNotification) and isinstance(
+            message.root, mcp.types.ToolListChangedNotification
+        ):
+            self.logger.info(f"Tools list changed on MCP server: {self.name}")
+            self.invalidate_tools_cache()
+            self._schedule_tools_refresh()
+
+    def _schedule_tools_refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_tools())
+
+    async def _refresh_tools(self):
         try:
-            transport = await self.exit_stack.enter_async_context(self.create_streams())
-            read, write = transport
-            session = await self.exit_stack.enter_async_context(ClientSession(read, write))
-            await session.initialize()
-            self.session = session
-            self.logger.info(f"Connected to MCP server: {self.name}")
+            await self._fetch_tools()
         except Exception as e:
-            self.logger.error(f"Error initializing MCP server: {e}")
+            self.logger.warning(f"Background tools refresh failed for {self.name}: {e}")
+
+    def _set_tools(self, tools: List[MCPTool], schema_hash: Optional[str] = None):
+        self._tools_list = tools
+        self.tools_hash = schema_hash or tools_hash(tools)
+
+    async def connect(self):
+        """
+        Connect to the server.
+
+        The transport and session are owned by a dedicated connection task, because
+        their anyio cancel scopes must be exited by the task that entered them. That
+        lets connect() and cleanup() be called from different tasks, e.g. under
+        per-server deadlines.
+        """
+        ready = asyncio.get_running_loop().create_future()
+        self._close_event = asyncio.Event()
+        self._connection_task = asyncio.create_task(self._run_connection(ready), name=f"mcp-connection-{self.name}")
+        try:
+            await ready
+        except BaseException:
+            # Failed, or cancelled mid-handshake: don't leak the transport
             await self.cleanup()
             raise
 
+    async def _run_connection(self, ready: asyncio.Future):
+        try:
+            async with self.exit_stack:
+                transport = await self.exit_stack.enter_async_context(self.create_streams())
+                read, write = transport
+                # Relay incoming messages so we notice when the transport ends (e.g. the
+                # server process died) instead of waiting for the next failed request
+                relayed_send, relayed_read = anyio.create_memory_object_stream(0)
+                relay = asyncio.create_task(self._relay(read, relayed_send))
+                self.exit_stack.push_async_callback(self._stop_relay, relay)
+                session = await self.exit_stack.enter_async_context(
+                    ClientSession(relayed_read, write, message_handler=self._handle_message)
+                )
+                await session.initialize()
+                self.session = session
+                self.logger.info(f"Connected to MCP server: {self.name}")
+                self._load_persisted_tools()
+                if not ready.done():
+                    ready.set_result(None)
+                closing = asyncio.create_task(self._close_event.wait())
+                await asyncio.wait({closing, relay}, return_when=asyncio.FIRST_COMPLETED)
+                closing.cancel()
+                if not self._close_event.is_set():
+                    self.logger.error(f"Connection to MCP server {self.name} lost: transport closed")
+        except Exception as e:
+            if ready.done():
+                self.logger.error(f"Connection to MCP server {self.name} lost: {e}")
+            else:
+                self.logger.error(f"Error initializing MCP server: {e}")
+                ready.set_exception(e)
+        finally:
+            self.session = None
+
+    @staticmethod
+    async def _relay(source: MemoryObjectReceiveStream, sink: MemoryObjectSendStream):
+        try:
+            async with source, sink:
+                async for message in source:
+                    await sink.send(message)
+        except (anyio.BrokenResourceError, anyio.ClosedResourceError):
+            pass
+
+    @staticmethod
+    async def _stop_relay(relay: asyncio.Task):
+        relay.cancel()
+        await asyncio.gather(relay, return_exceptions=True)
+
+    async def wait_disconnected(self, timeout: Optional[float] = None) -> bool:
+        """Wait up to `timeout` seconds for the connection to end; True if it has."""
+        task = self._connection_task
+        if task is None:
+            return True
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        return bool(done)
+
     async def list_tools(self) -> List[MCPTool]:
         """List the tools available on the server."""
         if not self.session:
             raise RuntimeError("Server not initialized. Make sure you call connect() first.")
 
         # Return from cache if caching is enabled, we have tools, and the cache is not dirty
-        if self.cache_tools_list and not self._cache_dirty and self._tools_list:
+        if self.cache_tools_list and not self._cache_dirty and self._tools_list is not None:
             return self._tools_list
 
+        return await self._fetch_tools()
+
+    async def _fetch_tools(self) -> List[MCPTool]:
         # Reset the cache dirty to False
         self._cache_dirty = False
 
         try:
             # Fetch the tools from the server
             result = await self.session.list_tools()
-            self._tools_list = result.tools
-            return self._tools_list
         except Exception as e:
+            self._cache_dirty = True
             self.logger.error(f"Error listing tools: {e}")
             raise
 
+        previous_hash = self.tools_hash
+        self._set_tools(result.tools)
+        key = self.tools_cache_key
+        if self._tools_store is not None and key and self.tools_hash != previous_hash:
+            await asyncio.to_thread(self._tools_store.save, key, self._tools_list, self.tools_hash)
+        return self._tools_list
+
+    def _load_persisted_tools(self):
+        """Serve the persisted tools list right away and revalidate it against the server."""
+        key = self.tools_cache_key
+        if self._tools_store is None or not key or self._tools_list is not None:
+            return
+        persisted = self._tools_store.load(key)
+        if persisted is None:
+            return
+        tools, schema_hash = persisted
+        self._set_tools(tools, schema_hash)
+        self._cache_dirty = False
+        self._schedule_tools_refresh()
+
     async def call_tool(self, tool_name: str, arguments: Optional[Dict[str, Any]] = None) -> CallToolResult:
         """Invoke a tool on the server."""
-        if not self.session:
+        session = self.session
+        if not session:
             raise RuntimeError("Server not initialized. Make sure you call connect() first.")
 
         arguments = arguments or {}
         try:
-            return await self.session.call_tool(tool_name, arguments)
+            if self.call_guard is not None:
+                return await self.call_guard.run(tool_name, lambda: session.call_tool(tool_name, arguments))
+            return await session.call_tool(tool_name, arguments)
         except Exception as e:
             self.logger.error(f"Error calling tool {tool_name}: {e}")
             raise
@@ -129,7 +260,16 @@ class _MCPServerWithClientSession(MCPServer):
         """Cleanup the server."""
         async with self._cleanup_lock:
             try:
-                await self.exit_stack.aclose()
+                if self._refresh_task is not None:
+                    self._refresh_task.cancel()
+                    self._refresh_task = None
+                task, self._connection_task = self._connection_task, None
+                if task is not None:
+                    if self.session is not None:
+                        self._close_event.set()
+                    else:
+                        task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
                 self.session = None
                 self.logger.info(f"Cleaned up MCP server: {self.name}")
             except Exception as e:
@@ -148,6 +288,8 @@ class MCPServerSse(_MCPServerWithClientSession):
         params: MCPServerSseParams,
         cache_tools_list: bool = False,
         name: Optional[str] = None,
+        tools_store: Optional[ToolSchemaStore] = None,
+        call_guard: Optional[CallGuard] = None,
     ):
         """Create a new MCP server based on the HTTP with SSE transport.
 
@@ -156,8 +298,10 @@ class MCPServerSse(_MCPServerWithClientSession):
                    timeout, and SSE read timeout.
             cache_tools_list: Whether to cache the tools list.
             name: A readable name for the server.
+            tools_store: Optional on-disk store for the cached tools list, keyed by URL.
+            call_guard: Optional concurrency limits, deadlines and circuit breaker for call_tool.
         """
-        super().__init__(cache_tools_list)
+        super().__init__(cache_tools_list, tools_store, call_guard)
         self.params = params
         self._name = name or f"SSE Server at {self.params.get('url', 'unknown')}"
 
@@ -182,39 +326,67 @@ class MCPServerSse(_MCPServerWithClientSession):
         """A readable name for the server."""
         return self._name
 
+    @property
+    def tools_cache_key(self) -> Optional[str]:
+        return self.params.get("url")
+
 # Stdio server implementation
-class MCPServerStdio(MCPServer):
-    """An example (minimal) Stdio server implementation."""
+class MCPServerStdio(_MCPServerWithClientSession):
+    """
+    MCP server implementation that spawns the server as a subprocess and talks to it
+    over stdin/stdout.
 
-    def __init__(self, params: MCPServerStdioParams, cache_tools_list: bool = False, name: Optional[str] = None):
+    Spawning and initializing happen in connect(), so put instances behind an
+    MCPServerPool to keep the processes running across jobs; the pool restarts a
+    process that exits.
+    """
+
+    def __init__(
+        self,
+        params: MCPServerStdioParams,
+        cache_tools_list: bool = False,
+        name: Optional[str] = None,
+        tools_store: Optional[ToolSchemaStore] = None,
+        call_guard: Optional[CallGuard] = None,
+    ):
+        """Create a new MCP server based on the stdio transport.
+
+        Args:
+            params: The params that configure the server including the command, args,
+                   env, cwd and encoding.
+            cache_tools_list: Whether to cache the tools list.
+            name: A readable name for the server.
+            tools_store: Optional on-disk store for the cached tools list, keyed by command line.
+            call_guard: Optional concurrency limits, deadlines and circuit breaker for call_tool.
+        """
+        super().__init__(cache_tools_list, tools_store, call_guard)
         self.params = params
-        self.cache_tools_list = cache_tools_list
-        self._tools_cache: Optional[List[MCPTool]] = None
         self._name = name or f"Stdio Server: {self.params.get('command', 'unknown')}"
-        self.connected = False
-        self.logger = logging.getLogger(__name__)
+
+    def create_streams(
+        self,
+    ) -> AbstractAsyncContextManager[
+        Tuple[
+            MemoryObjectReceiveStream[JSONRPCMessage | Exception],
+            MemoryObjectSendStream[JSONRPCMessage],
+        ]
+    ]:
+        """Create the streams for the server."""
+        return stdio_client(
+            StdioServerParameters(
+                command=self.params["command"],
+                args=self.params.get("args", []),
+                env=self.params.get("env"),
+                cwd=self.params.get("cwd"),
+                encoding=self.params.get("encoding", "utf-8"),
+            )
+        )
 
     @property
     def name(self) -> str:
+        """A readable name for the server."""
         return self._name
 
-    async def connect(self):
-        await asyncio.sleep(0.5)
-        self.connected = True
-        self.logger.info(f"Connected to MCP Stdio server: {self.name}")
-
-    async def list_tools(self) -> List[MCPTool]:
-        if self.cache_tools_list and self._tools_cache is not None:
-            return self._tools_cache
-        # For demonstration, return an empty list or similar static tools.
-        tools: List[MCPTool] = []
-        if self.cache_tools_list:
-            self._tools_cache = tools
-        return tools
-
-    async def call_tool(self, tool_name: str, arguments: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        return {"content": [f"Called {tool_name} with args {arguments} via Stdio"]}
-
-    async def cleanup(self):
-        self.connected = False
-        self.logger.info(f"Cleaned up MCP Stdio server: {self.name}")
\ No newline at end of file
+    @property
+    def tools_cache_key(self) -> Optional[str]:
+        return " ".join(["stdio:", self.params["command"], *self.params.get("args", [])])
\ No newline at end of file
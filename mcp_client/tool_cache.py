@@ -0,0 +1,59 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import List, Optional, Tuple
+
+from mcp.types import Tool as MCPTool
+
+logger = logging.getLogger("mcp-tool-cache")
+
+
+def tools_hash(tools: List[MCPTool]) -> str:
+    """Content hash of a tool list; changes whenever a name, description or schema does."""
+    dumped = [tool.model_dump(mode="json", exclude_none=True) for tool in tools]
+    return hashlib.sha256(json.dumps(dumped, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class ToolSchemaStore:
+    """
+    Persists MCP tool lists on disk, one JSON file per server key (e.g. the SSE URL),
+    so a fresh connection can skip the initial list_tools round trip.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def load(self, key: str) -> Optional[Tuple[List[MCPTool], str]]:
+        """Return (tools, hash) persisted for `key`, or None."""
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("key") != key:
+                return None
+            return [MCPTool.model_validate(tool) for tool in data["tools"]], data["hash"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable tool cache for {key}: {e}")
+            return None
+
+    def save(self, key: str, tools: List[MCPTool], schema_hash: str):
+        """Atomically replace the persisted tool list for `key`."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            payload = {
+                "key": key,
+                "hash": schema_hash,
+                "tools": [tool.model_dump(mode="json", exclude_none=True) for tool in tools],
+            }
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            logger.warning(f"Failed to persist tool list for {key}: {e}")
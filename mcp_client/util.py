@@ -1,12 +1,16 @@
 import asyncio
 import json
 import functools
-from typing import Any, Dict, List
+import os
+from typing import Any, Dict, List, Optional
 
 # Import from mcp libraries
 from mcp.types import Tool as MCPTool, CallToolResult
 from .server import MCPServer
 
+# Upper bound on what a single tool result may put into the model's context
+DEFAULT_MAX_RESULT_CHARS = int(os.environ.get("MCP_RESULT_MAX_CHARS", 4000))
+
 # A minimal FunctionTool class used by the agent.
 class FunctionTool:
     def __init__(self, name: str, description: str, params_json_schema: Dict[str, Any], on_invoke_tool, strict_json_schema: bool = False):
@@ -19,59 +23,152 @@ class FunctionTool:
     def __repr__(self):
         return f"FunctionTool(name={self.name})"
 
+
+def _shrink_json(text: str, budget: int) -> Optional[str]:
+    """Keep whole leading items of a JSON array/object that fit `budget`, noting what was dropped."""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if isinstance(data, list):
+        encoded_items = (json.dumps(item, ensure_ascii=False) for item in data)
+    elif isinstance(data, dict):
+        encoded_items = (f"{json.dumps(k, ensure_ascii=False)}: {json.dumps(v, ensure_ascii=False)}" for k, v in data.items())
+    else:
+        return None
+    unit = "items" if isinstance(data, list) else "keys"
+    # The note counts towards the budget; room is kept for the longest it could be
+    kept, used = [], 2 + len(f" /* {len(data)} more {unit} truncated */")
+    for encoded in encoded_items:
+        if used + len(encoded) + 2 > budget:
+            break
+        kept.append(encoded)
+        used += len(encoded) + 2
+    dropped = len(data) - len(kept)
+    opener, closer = ("[", "]") if isinstance(data, list) else ("{", "}")
+    note = f" /* {dropped} more {unit} truncated */" if dropped else ""
+    shrunk = f"{opener}{', '.join(kept)}{closer}{note}"
+    return shrunk if len(shrunk) <= budget else None
+
+
+def _truncate_text(text: str, budget: int) -> str:
+    """Cut `text` to `budget` characters, the note included, on a line or word boundary, noting how much was dropped."""
+    if len(text) <= budget:
+        return text
+    stripped = text.lstrip()
+    if stripped[:1] in "[{":
+        shrunk = _shrink_json(stripped, budget)
+        if shrunk is not None:
+            return shrunk
+    # The note counts towards the budget; room is kept for the longest it could be
+    room = budget - len(f" ... [truncated {len(text)} characters]")
+    if room < budget // 2:
+        # Too small a budget to spend on the note
+        return text[:budget]
+    cut = text.rfind("\n", 0, room)
+    if cut < room // 2:
+        cut = text.rfind(" ", 0, room)
+    if cut < room // 2:
+        cut = room
+    return f"{text[:cut].rstrip()} ... [truncated {len(text) - cut} characters]"
+
+
+def _content_text(item: Any) -> str:
+    """Text for one content block; binary payloads are described rather than inlined."""
+    kind = getattr(item, "type", None)
+    if kind == "text":
+        return item.text
+    if kind in ("image", "audio"):
+        return f"[{kind}: {item.mimeType}, {len(item.data) * 3 // 4} bytes]"
+    if kind == "resource":
+        resource = item.resource
+        text = getattr(resource, "text", None)
+        if text is not None:
+            return text
+        return f"[resource {resource.uri}: {resource.mimeType or 'binary'}, {len(getattr(resource, 'blob', '')) * 3 // 4} bytes]"
+    if kind == "resource_link":
+        return f"[resource link: {item.uri}]"
+    if isinstance(item, (str, int, float, bool)):
+        return str(item)
+    try:
+        return json.dumps(item)
+    except TypeError:
+        return str(item)
+
+
+def decode_call_tool_result(result: Any, max_chars: int = DEFAULT_MAX_RESULT_CHARS) -> str:
+    """
+    Decode a CallToolResult into the string handed back to the model.
+
+    Content blocks are decoded by type and accumulated only up to `max_chars`, so a
+    huge payload is never fully serialized; the block that crosses the limit is
+    truncated smartly (whole JSON items, or a line/word boundary) and the rest is
+    summarized in a note.
+    """
+    if isinstance(result, CallToolResult):
+        content, structured, is_error = result.content, result.structuredContent, result.isError
+    elif isinstance(result, dict):
+        # Legacy dict-shaped results
+        content, structured, is_error = result.get("content"), None, bool(result.get("isError"))
+        if not isinstance(content, list):
+            content = [result]
+    else:
+        content, structured, is_error = [result], None, False
+
+    if not content and structured is not None:
+        content = [json.dumps(structured)]
+
+    prefix = "Error: " if is_error else ""
+    content = content or []
+    parts, used, skipped = [], len(prefix), 0
+    for i, item in enumerate(content):
+        # Room for the note about the blocks after this one, in case they don't fit
+        remaining = len(content) - i - 1
+        room = max_chars - used - (len(f"\n[{remaining} more content blocks omitted]") if remaining else 0)
+        if room <= 0:
+            skipped = len(content) - i
+            break
+        text = _truncate_text(_content_text(item), room)
+        parts.append(text)
+        used += len(text) + 1
+    if skipped:
+        parts.append(f"[{skipped} more content blocks omitted]")
+    decoded = prefix + "\n".join(parts) if parts else prefix + "(no content)"
+    return decoded[:max_chars]
+
+
 class MCPUtil:
     @classmethod
-    async def get_function_tools(cls, server, convert_schemas_to_strict: bool) -> List[FunctionTool]:
+    async def get_function_tools(cls, server, convert_schemas_to_strict: bool,
+                                 max_result_chars: int = DEFAULT_MAX_RESULT_CHARS) -> List[FunctionTool]:
         tools = await server.list_tools()
         function_tools = []
         for tool in tools:
-            ft = cls.to_function_tool(tool, server, convert_schemas_to_strict)
+            ft = cls.to_function_tool(tool, server, convert_schemas_to_strict, max_result_chars)
             function_tools.append(ft)
         return function_tools
 
     @classmethod
-    def to_function_tool(cls, tool, server, convert_schemas_to_strict: bool) -> FunctionTool:
-        # In a more complete implementation, you might convert the JSON schema into a strict version.
+    def to_function_tool(cls, tool, server, convert_schemas_to_strict: bool,
+                         max_result_chars: int = DEFAULT_MAX_RESULT_CHARS) -> FunctionTool:
+        # The schema as the server declared it; the decorated tool derives the strict form the model sees
         schema = tool.inputSchema
 
         # Use a default argument to capture the current tool correctly in the closure
-        async def invoke_tool(context: Any, input_json: str, current_tool_name=tool.name) -> str:
+        # `input_json` may also be an already-decoded dict, which skips a JSON round trip
+        async def invoke_tool(context: Any, input_json: Any, current_tool_name=tool.name) -> str:
             try:
-                arguments = json.loads(input_json) if input_json else {}
+                arguments = input_json if isinstance(input_json, dict) else (json.loads(input_json) if input_json else {})
             except Exception as e:
                 # Return error message as string
                 return f"Error parsing input JSON for tool '{current_tool_name}': {e}"
             try:
                 result = await server.call_tool(current_tool_name, arguments)
-                # Ensure the final return value is a string
-                if "content" in result and isinstance(result["content"], list) and len(result["content"]) >= 1:
-                     # Handle single or multiple content items - convert to string
-                     if len(result["content"]) == 1:
-                         content_item = result["content"][0]
-                         # Convert simple types explicitly to string
-                         if isinstance(content_item, (str, int, float, bool)):
-                             return str(content_item)
-                         # Convert complex types (like dict, list) to JSON string
-                         else:
-                             try:
-                                 return json.dumps(content_item)
-                             except TypeError:
-                                 return str(content_item) # Fallback to default string representation
-                     else:
-                         # Multiple content items, return as JSON array string
-                          try:
-                              return json.dumps(result["content"])
-                          except TypeError:
-                              return str(result["content"]) # Fallback
-                else:
-                    # If 'content' is missing, not a list, or empty, return string representation of the whole result
-                    try:
-                        return json.dumps(result)
-                    except TypeError:
-                        return str(result) # Fallback
             except Exception as e:
                  # Catch errors during tool call itself
                  return f"Error calling tool '{current_tool_name}': {e}"
+            # Decoded once, straight from the typed result, within the size cap
+            return decode_call_tool_result(result, max_result_chars)
 
         return FunctionTool(
             name=tool.name,
@@ -79,4 +176,4 @@ class MCPUtil:
             params_json_schema=schema,
             on_invoke_tool=invoke_tool,
             strict_json_schema=convert_schemas_to_strict,
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("memory-index")
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i if in is it its me my of on or our "
+    "she so that the their them they this to was we were what when where which who will with you your".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting prompt space."""
+    return max(1, math.ceil(len(text) / 4))
+
+
+def _terms(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _timestamp(record: Dict[str, Any]) -> Optional[float]:
+    value = record.get("updated_at") or record.get("created_at")
+    if not value:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def memory_records(results: Any) -> List[Dict[str, Any]]:
+    """Normalize a mem0 get_all/search response (a list, or {"results": [...]}) to a list of records."""
+    if isinstance(results, dict):
+        results = results.get("results") or []
+    return [r for r in results or [] if isinstance(r, dict) and r.get("memory")]
+
+
+class MemoryIndex:
+    """
+    Local BM25 index over a user's memories, ranked by relevance blended with recency.
+
+    Works on plain mem0-style records (`memory`, `id`, `updated_at`), such as the ones a
+    MemorySnapshot keeps.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]], recency_half_life_days: float = 30.0,
+                 recency_weight: float = 0.3):
+        """
+        Args:
+            records: mem0-style memory records.
+            recency_half_life_days: Age at which a memory's recency score halves.
+            recency_weight: Share of the final score given to recency (0 = relevance only).
+        """
+        self.records = list(records)
+        self.recency_half_life_days = recency_half_life_days
+        self.recency_weight = recency_weight
+        self._doc_terms = [Counter(_terms(r["memory"])) for r in self.records]
+        self._doc_lengths = [sum(terms.values()) for terms in self._doc_terms]
+        self._avg_length = (sum(self._doc_lengths) / len(self._doc_lengths)) if self.records else 0.0
+        self._doc_freq: Counter = Counter()
+        for terms in self._doc_terms:
+            self._doc_freq.update(terms.keys())
+        self._timestamps = [_timestamp(r) for r in self.records]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _bm25(self, query_terms: List[str], i: int, k1: float = 1.5, b: float = 0.75) -> float:
+        terms, length, n = self._doc_terms[i], self._doc_lengths[i], len(self.records)
+        score = 0.0
+        for term in query_terms:
+            tf = terms.get(term)
+            if not tf:
+                continue
+            idf = math.log(1 + (n - self._doc_freq[term] + 0.5) / (self._doc_freq[term] + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / (self._avg_length or 1)))
+        return score
+
+    def _recency(self, i: int, now: float) -> float:
+        ts = self._timestamps[i]
+        if ts is None:
+            return 0.0
+        age_days = max(now - ts, 0.0) / 86400
+        return 0.5 ** (age_days / self.recency_half_life_days)
+
+    def rank(self, query: str = "") -> List[Dict[str, Any]]:
+        """All records, best first."""
+        query_terms = list(set(_terms(query)))
+        now = time.time()
+        relevance = [self._bm25(query_terms, i) for i in range(len(self.records))] if query_terms else []
+        top = max(relevance, default=0.0) or 1.0
+        weight = self.recency_weight if relevance and max(relevance) > 0 else 1.0
+        scored = []
+        for i, record in enumerate(self.records):
+            rel = relevance[i] / top if relevance else 0.0
+            scored.append(((1 - weight) * rel + weight * self._recency(i, now), i))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [self.records[i] for _, i in scored]
+
+    def select(self, query: str = "", k: int = 20, token_budget: int = 800,
+               exclude_ids: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """The top-`k` memories for `query` whose texts together fit within `token_budget`."""
+        excluded = set(exclude_ids or ())
+        selected, used = [], 0
+        for record in self.rank(query):
+            if len(selected) >= k:
+                break
+            if record.get("id") is not None and record["id"] in excluded:
+                continue
+            cost = estimate_tokens(json.dumps(record["memory"]))
+            if used + cost > token_budget:
+                continue
+            selected.append(record)
+            used += cost
+        return selected
+
+    def recall(self, query: str, k: int = 20, token_budget: int = 400, exclude_ids: Optional[Iterable[str]] = None) -> str:
+        """What the recall_memories tool answers: the selected memories' texts as a JSON list."""
+        selected = self.select(query, k=k, token_budget=token_budget, exclude_ids=exclude_ids)
+        return json.dumps([m["memory"] for m in selected]) if selected else "Nothing relevant in the vault."
+
+
+class MemorySnapshot:
+    """
+    Per-user on-disk copy of the memory vault, so session start reads local storage
+    instead of waiting on a remote get_all.
+
+    `sync()` fetches only memories updated since the newest one already stored, and
+    falls back to (and periodically forces) a full fetch, which also drops memories
+    deleted upstream.
+    """
+
+    def __init__(self, directory: str, user_id: str, full_sync_interval: float = 6 * 3600, page_size: int = 100):
+        """
+        Args:
+            directory: Where snapshot files live (one JSON file per user).
+            user_id: The mem0 user the snapshot mirrors.
+            full_sync_interval: Seconds between full refetches that reconcile deletions.
+            page_size: Records requested per get_all page.
+        """
+        self.user_id = user_id
+        self.full_sync_interval = full_sync_interval
+        self.page_size = page_size
+        self.path = os.path.join(directory, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', user_id)}.json")
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._last_full_sync = 0.0
+        self._loaded = False
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Read the snapshot from disk (once) and return its records."""
+        if not self._loaded:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self._records = {r["id"]: r for r in data.get("records", []) if r.get("id")}
+                self._last_full_sync = data.get("last_full_sync", 0.0)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable memory snapshot {self.path}: {e}")
+            self._loaded = True
+        return list(self._records.values())
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"user_id": self.user_id, "last_full_sync": self._last_full_sync,
+                       "records": list(self._records.values())}, f)
+        os.replace(tmp_path, self.path)
+
+    def _watermark(self) -> Optional[str]:
+        latest = max(self._records.values(), key=lambda r: _timestamp(r) or 0.0, default=None)
+        return (latest.get("updated_at") or latest.get("created_at")) if latest else None
+
+    async def _fetch(self, client: Any, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Every record matching `filters`, following get_all's pages until `next` runs out."""
+        records, page = [], 1
+        while True:
+            response = await client.get_all(filters=filters, page=page, page_size=self.page_size)
+            records.extend(memory_records(response))
+            if not isinstance(response, dict) or not response.get("next"):
+                return records
+            page += 1
+
+    async def sync(self, client: Any) -> int:
+        """Pull changes from `client` into the snapshot; returns the number of records changed."""
+        await asyncio.to_thread(self.load)
+        watermark = self._watermark()
+        full = watermark is None or time.time() - self._last_full_sync > self.full_sync_interval
+        records = None
+        if not full:
+            try:
+                filters = {"AND": [{"user_id": self.user_id}, {"updated_at": {"gte": watermark}}]}
+                records = await self._fetch(client, filters)
+            except Exception as e:
+                logger.info(f"Delta memory sync unavailable, doing a full sync: {e}")
+                full = True
+        if full:
+            # All pages are read before _records is replaced, so a partial fetch never drops memories
+            records = await self._fetch(client, {"user_id": self.user_id})
+
+        changed = sum(1 for r in records if r.get("id") and self._records.get(r["id"]) != r)
+        if full:
+            changed += len(set(self._records) - {r.get("id") for r in records})
+            self._records = {}
+            self._last_full_sync = time.time()
+        self._records.update({r["id"]: r for r in records if r.get("id")})
+        await asyncio.to_thread(self._save)
+        logger.info(f"Memory snapshot for {self.user_id} synced ({'full' if full else 'delta'}): "
+                    f"{changed} changed, {len(self._records)} total")
+        return changed
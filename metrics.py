@@ -0,0 +1,180 @@
+import functools
+import glob
+import os
+import re
+import time
+from typing import Callable, Dict, List, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess, values,
+)
+from prometheus_client.core import GaugeMetricFamily, Metric
+
+import cache
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Every process writes its samples here and /metrics aggregates them (prometheus_client
+# multiprocess mode). The LiveKit worker empties the directory it is given when it starts, which
+# would take the files the service process opened at import with it, so job processes get JOBS_DIR
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR", ".cache/prometheus")
+JOBS_DIR = os.path.join(MULTIPROC_DIR, "jobs")
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STARTUP_PHASE_SECONDS = Histogram(
+    "jarvis_startup_phase_seconds", "Duration of each session startup phase", ["phase"], buckets=_LATENCY_BUCKETS
+)
+TOOL_CALL_SECONDS = Histogram(
+    "jarvis_tool_call_seconds", "Duration of tool calls made by the model", ["tool", "source", "outcome"],
+    buckets=_LATENCY_BUCKETS,
+)
+ACTIVE_SESSIONS = Gauge("jarvis_active_sessions", "Sessions currently running", multiprocess_mode="livesum")
+PENDING_TOOL_CALLS = Gauge("jarvis_pending_tool_calls", "Tool calls in flight", multiprocess_mode="livesum")
+EVENT_LOOP_LAG = Gauge(
+    "jarvis_event_loop_lag_seconds", "Recent peak delay of the event loop's timers", multiprocess_mode="livemax"
+)
+LOOP_BLOCK_SECONDS = Histogram(
+    "jarvis_event_loop_block_seconds", "Event loop blocks caught by the watchdog, by blocking call site", ["site"],
+    buckets=_LATENCY_BUCKETS,
+)
+SEARCH_TIERS = Counter("jarvis_search_tier", "search_web calls by the Tavily depth that answered them", ["tier"])
+CACHE_LOOKUPS = Counter("jarvis_cache_lookups", "Tool cache lookups by outcome", ["cache", "result"])
+
+# Cache stats already folded into CACHE_LOOKUPS, per (cache, result)
+_cache_seen: Dict[Tuple[str, str], int] = {}
+_CACHE_RESULTS = {"hit": "hits", "disk_hit": "disk_hits", "stale_hit": "stale_hits", "coalesced": "coalesced",
+                  "miss": "misses"}
+
+
+def observe_phase(name: str, seconds: float):
+    STARTUP_PHASE_SECONDS.labels(name).observe(seconds)
+
+
+def observe_tool(tool: str, source: str, seconds: float, ok: bool):
+    TOOL_CALL_SECONDS.labels(tool, source, "ok" if ok else "error").observe(seconds)
+
+
+def sync_cache_stats():
+    """Fold the tool caches' counters into CACHE_LOOKUPS; cheap enough to run after every tool call."""
+    for name, stats in cache.all_stats().items():
+        for result, field in _CACHE_RESULTS.items():
+            value = stats.get(field, 0)
+            delta = value - _cache_seen.get((name, result), 0)
+            if delta > 0:
+                CACHE_LOOKUPS.labels(name, result).inc(delta)
+                _cache_seen[(name, result)] = value
+
+
+def timed_tool(fn: Callable) -> Callable:
+    """Record a local tool's duration and outcome; apply beneath @function_tool()."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        ok = False
+        PENDING_TOOL_CALLS.inc()
+        try:
+            result = await fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            PENDING_TOOL_CALLS.dec()
+            observe_tool(fn.__name__, "local", time.perf_counter() - start, ok)
+            sync_cache_stats()
+    return wrapper
+
+
+def _cache_hit_ratio(families: List[Metric]) -> GaugeMetricFamily:
+    """Hit ratio per cache, derived from the aggregated lookup counters at scrape time."""
+    totals: Dict[str, Dict[str, float]] = {}
+    for family in families:
+        if family.name != "jarvis_cache_lookups":
+            continue
+        for sample in family.samples:
+            if sample.name.endswith("_total"):
+                counts = totals.setdefault(sample.labels["cache"], {})
+                counts[sample.labels["result"]] = counts.get(sample.labels["result"], 0) + sample.value
+    ratio = GaugeMetricFamily("jarvis_cache_hit_ratio", "Share of tool cache lookups served from cache", labels=["cache"])
+    for name, counts in totals.items():
+        lookups = sum(counts.values())
+        if lookups:
+            ratio.add_metric([name], (lookups - counts.get("miss", 0)) / lookups)
+    return ratio
+
+
+class _Collected:
+    def __init__(self, families: List[Metric]):
+        self._families = families
+
+    def collect(self) -> List[Metric]:
+        return self._families
+
+
+def _forget_dead_processes(directory: str):
+    """Drop live gauges (active sessions) left behind by job processes that exited without cleaning up."""
+    for filename in os.listdir(directory):
+        match = re.fullmatch(r"gauge_live\w+_(\d+)\.db", filename)
+        if not match:
+            continue
+        pid = int(match.group(1))
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            multiprocess.mark_process_dead(pid, directory)
+        except PermissionError:
+            pass
+
+
+def _sample_files(pattern: str) -> List[str]:
+    """Sample files matching `pattern` in MULTIPROC_DIR and JOBS_DIR, after forgetting exited processes."""
+    files = []
+    for directory in (MULTIPROC_DIR, JOBS_DIR):
+        if os.path.isdir(directory):
+            _forget_dead_processes(directory)
+            files.extend(glob.glob(os.path.join(directory, pattern)))
+    return files
+
+
+def _live_gauges() -> List[Metric]:
+    """
+    The live gauges of every process writing samples to files. Only the gauge_live* files are
+    read: counters and histograms of every process that ever ran stay in the directory, and
+    parsing them all on each load check would cost more the longer the worker runs.
+    """
+    files = _sample_files("gauge_live*.db") if "PROMETHEUS_MULTIPROC_DIR" in os.environ else []
+    return list(multiprocess.MultiProcessCollector.merge(files, accumulate=False)) if files else []
+
+
+def live_values() -> Dict[str, float]:
+    """
+    Active sessions and pending tool calls (summed) and event loop lag (max), over
+    this process and every job process.
+    """
+    live = {"active_sessions": 0.0, "pending_tool_calls": 0.0, "event_loop_lag_seconds": 0.0}
+    # Jobs run in this process with the thread executor, and in job processes otherwise. A process
+    # that imported prometheus_client before PROMETHEUS_MULTIPROC_DIR was set keeps its own in memory
+    sources = [_live_gauges()]
+    if values.ValueClass is values.MutexValue:
+        sources.append(REGISTRY.collect())
+    for families in sources:
+        for family in families:
+            name = family.name[len("jarvis_"):]
+            if name not in live:
+                continue
+            samples = [sample.value for sample in family.samples]
+            if name == "event_loop_lag_seconds":
+                live[name] = max([live[name], *samples])
+            else:
+                live[name] += sum(samples)
+    return live
+
+
+def render() -> bytes:
+    """Every metric in Prometheus text format, aggregated across processes when they write to MULTIPROC_DIR."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        families = list(multiprocess.MultiProcessCollector.merge(_sample_files("*.db"), accumulate=True))
+    else:
+        families = list(REGISTRY.collect())
+    registry = CollectorRegistry(auto_describe=False)
+    registry.register(_Collected(families + [_cache_hit_ratio(families)]))
+    return generate_latest(registry)
@@ -0,0 +1,365 @@
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("school-outreach")
+
+_EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+# "info [at] school [dot] edu", "info(at)school.edu"
+_OBFUSCATED_AT = re.compile(r"\s*[\[\(\{]\s*at\s*[\]\)\}]\s*|\s+at\s+(?=[\w-]+\s*(?:\.|[\[\(\{]\s*dot))", re.I)
+_OBFUSCATED_DOT = re.compile(r"\s*[\[\(\{]\s*dot\s*[\]\)\}]\s*", re.I)
+_NOT_EMAIL_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".css", ".js")
+_PLACEHOLDER_DOMAINS = ("example.com", "example.org", "domain.com", "email.com", "yourschool.edu")
+
+
+def extract_emails(text: str) -> List[str]:
+    """Contact addresses in `text`, lower-cased and deduplicated in order of appearance."""
+    text = _OBFUSCATED_DOT.sub(".", _OBFUSCATED_AT.sub("@", text or ""))
+    found: Dict[str, None] = {}
+    for match in _EMAIL_RE.findall(text):
+        email = match.lower().strip(".")
+        domain = email.rsplit("@", 1)[1]
+        if email.endswith(_NOT_EMAIL_SUFFIXES) or domain in _PLACEHOLDER_DOMAINS or "sentry" in domain:
+            continue
+        found.setdefault(email, None)
+    return list(found)
+
+
+def school_key(name: str) -> str:
+    """"St. Mary's High School" and "st marys high school" are the same school."""
+    return " ".join(re.sub(r"[^\w\s@.-]", "", name.lower()).replace(".", " ").split())
+
+
+class OutreachStore:
+    """
+    Schools, their contacts and what was sent to them, in a local SQLite file. Goal
+    progress, recent sends and "have we got / emailed this one already" are indexed
+    lookups, cheap enough to run on every session start.
+    """
+
+    _CONTACT_COLUMNS = {
+        "school_key": "TEXT", "status": "TEXT NOT NULL DEFAULT 'new'", "send_count": "INTEGER NOT NULL DEFAULT 0",
+        "last_sent_at": "REAL", "last_subject": "TEXT",
+    }
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS schools (key TEXT PRIMARY KEY, name TEXT NOT NULL, searched_at REAL, "
+                "contacts_found INTEGER NOT NULL DEFAULT 0, first_sent_at REAL, last_sent_at REAL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS contacts (email TEXT PRIMARY KEY, school TEXT NOT NULL, "
+                "source_url TEXT, job_id TEXT, found_at REAL NOT NULL)"
+            )
+            # Contacts tables from before send tracking only lack the new columns
+            existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(contacts)")}
+            for column, ddl in self._CONTACT_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE contacts ADD COLUMN {column} {ddl}")
+            # ...and their schools, whose keys are only computed here
+            legacy = self._conn.execute(
+                "SELECT school, COUNT(*) AS found FROM contacts WHERE school_key IS NULL GROUP BY school"
+            ).fetchall()
+            for row in legacy:
+                key = school_key(row["school"])
+                self._upsert_school(key, row["school"])
+                self._conn.execute("UPDATE schools SET contacts_found = contacts_found + ? WHERE key = ?",
+                                   (row["found"], key))
+                self._conn.execute("UPDATE contacts SET school_key = ? WHERE school_key IS NULL AND school = ?",
+                                   (key, row["school"]))
+            self._conn.execute("DROP INDEX IF EXISTS contacts_school")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS contacts_school_key ON contacts (school_key)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS contacts_status ON contacts (status)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS contacts_last_sent ON contacts (last_sent_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS schools_first_sent ON schools (first_sent_at)")
+            self._conn.commit()
+
+    def _upsert_school(self, key: str, name: str):
+        self._conn.execute("INSERT OR IGNORE INTO schools (key, name) VALUES (?, ?)", (key, name))
+
+    def add_contacts(self, school: str, contacts: Iterable[Tuple[str, Optional[str]]],
+                     job_id: Optional[str] = None) -> int:
+        """Store (email, source_url) pairs for a school; returns how many addresses were new."""
+        now = time.time()
+        key = school_key(school)
+        with self._lock:
+            self._upsert_school(key, school)
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO contacts (email, school, school_key, source_url, job_id, found_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(email.lower(), school, key, url, job_id, now) for email, url in contacts],
+            )
+            new = self._conn.total_changes - before
+            self._conn.execute("UPDATE schools SET contacts_found = contacts_found + ? WHERE key = ?", (new, key))
+            self._conn.commit()
+            return new
+
+    def mark_searched(self, school: str):
+        with self._lock:
+            self._upsert_school(school_key(school), school)
+            self._conn.execute("UPDATE schools SET searched_at = ? WHERE key = ?", (time.time(), school_key(school)))
+            self._conn.commit()
+
+    def record_send(self, emails: Iterable[str], subject: Optional[str] = None, ok: bool = True) -> int:
+        """
+        Record an email sent (or failed) to each address. Addresses not found by a
+        search are added under their domain as the school. Returns the number recorded.
+        """
+        now = time.time()
+        emails = [email.strip().lower() for email in emails if email and "@" in email]
+        with self._lock:
+            for email in emails:
+                row = self._conn.execute("SELECT school, school_key FROM contacts WHERE email = ?", (email,)).fetchone()
+                if row is None or row["school_key"] is None:
+                    school = row["school"] if row is not None else email.rsplit("@", 1)[1]
+                    key = school_key(school)
+                    self._upsert_school(key, school)
+                    self._conn.execute(
+                        "INSERT INTO contacts (email, school, school_key, found_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (email) DO UPDATE SET school_key = excluded.school_key",
+                        (email, school, key, now),
+                    )
+                else:
+                    key = row["school_key"]
+                if ok:
+                    self._conn.execute(
+                        "UPDATE contacts SET status = 'sent', send_count = send_count + 1, last_sent_at = ?, "
+                        "last_subject = ? WHERE email = ?",
+                        (now, subject, email),
+                    )
+                    self._conn.execute(
+                        "UPDATE schools SET first_sent_at = COALESCE(first_sent_at, ?), last_sent_at = ? WHERE key = ?",
+                        (now, now, key),
+                    )
+                else:
+                    self._conn.execute(
+                        "UPDATE contacts SET status = 'failed' WHERE email = ? AND status != 'sent'", (email,)
+                    )
+            self._conn.commit()
+        return len(emails)
+
+    def goal_status(self, goal: int, week: float = 7 * 86400) -> Dict[str, Any]:
+        since = time.time() - week
+        with self._lock:
+            emailed = self._conn.execute("SELECT COUNT(*) FROM schools WHERE first_sent_at IS NOT NULL").fetchone()[0]
+            schools = self._conn.execute("SELECT COUNT(*) FROM schools").fetchone()[0]
+            contacts = self._conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+            unsent = self._conn.execute("SELECT COUNT(*) FROM contacts WHERE status = 'new'").fetchone()[0]
+            this_week = self._conn.execute(
+                "SELECT COUNT(*) FROM schools WHERE first_sent_at >= ?", (since,)
+            ).fetchone()[0]
+            last = self._conn.execute("SELECT MAX(last_sent_at) FROM contacts").fetchone()[0]
+        return {
+            "goal": goal,
+            "schools_emailed": emailed,
+            "remaining": max(0, goal - emailed),
+            "schools_emailed_this_week": this_week,
+            "schools_known": schools,
+            "contacts_known": contacts,
+            "contacts_not_yet_emailed": unsent,
+            "hours_since_last_email": round((time.time() - last) / 3600, 1) if last else None,
+        }
+
+    def contacted_since(self, since: float, limit: int = 20) -> List[Dict[str, Any]]:
+        """Addresses emailed since `since` (epoch seconds), most recent first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT email, school, last_sent_at, last_subject FROM contacts WHERE last_sent_at >= ? "
+                "ORDER BY last_sent_at DESC LIMIT ?",
+                (since, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def lookup(self, query: str) -> Optional[Dict[str, Any]]:
+        """An address, or a school by name, with what we have on it; None if it's new to us."""
+        with self._lock:
+            if "@" in query:
+                row = self._conn.execute(
+                    "SELECT email, school, status, send_count, last_sent_at, found_at FROM contacts WHERE email = ?",
+                    (query.strip().lower(),),
+                ).fetchone()
+                return dict(row) if row is not None else None
+            row = self._conn.execute("SELECT * FROM schools WHERE key = ?", (school_key(query),)).fetchone()
+            if row is None:
+                return None
+            school = dict(row)
+            school["contacts"] = [dict(r) for r in self._conn.execute(
+                "SELECT email, status, last_sent_at FROM contacts WHERE school_key = ? LIMIT 10", (row["key"],)
+            )]
+            return school
+
+    def already_found(self, schools: Iterable[str]) -> List[str]:
+        """The schools among `schools` that already have contacts."""
+        names = {school_key(school): school for school in schools}
+        if not names:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key FROM schools WHERE contacts_found > 0 AND key IN ({', '.join('?' * len(names))})",
+                list(names),
+            ).fetchall()
+        return [names[row["key"]] for row in rows]
+
+    def count_contacts(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RateLimiter:
+    """Spaces calls at least 1/`rate` seconds apart, across every task that shares it."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class OutreachJob:
+    """One batch of schools worked through in the background; `progress()` is safe to call at any time."""
+
+    def __init__(self, schools: Sequence[str]):
+        self.id = uuid.uuid4().hex[:8]
+        self.schools = list(schools)
+        self.done = 0
+        self.failed: List[str] = []
+        self.without_contacts: List[str] = []
+        self.new_contacts = 0
+        self.duplicates = 0
+        self.recent: List[str] = []
+        self.already_known: List[str] = []
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def progress(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": "finished" if self.finished_at else "running",
+            "schools_done": self.done,
+            "schools_total": len(self.schools),
+            "new_contacts": self.new_contacts,
+            "duplicates_skipped": self.duplicates,
+            "schools_already_known": len(self.already_known),
+            "no_contacts_found": self.without_contacts[-10:],
+            "failed": self.failed[-10:],
+            "recent": self.recent[-5:],
+            "elapsed_seconds": round((self.finished_at or time.time()) - self.started_at, 1),
+        }
+
+
+class OutreachPipeline:
+    """
+    Finds contact emails for a batch of schools. Searches fan out over `concurrency`
+    workers at no more than `rate` per second; each school is searched at the
+    depths in `depths` in turn until one yields an address. Schools that already
+    have contacts are skipped, and addresses are deduplicated against the store
+    and saved as each school completes.
+    """
+
+    def __init__(self, search: Callable[[str, str], Awaitable[Dict[str, Any]]], store: OutreachStore,
+                 concurrency: int = 4, rate: float = 3.0, depths: Sequence[str] = ("basic", "advanced"),
+                 query_template: str = "{school} school contact email address"):
+        """
+        Args:
+            search: `search(query, depth)` returning a Tavily-shaped response.
+            store: Where contacts are saved.
+            concurrency: Schools searched at once.
+            rate: Searches started per second, across all workers.
+            depths: Search depths tried in order while no address has been found.
+            query_template: Search query for a school.
+        """
+        self.search = search
+        self.store = store
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate)
+        self.depths = tuple(depths)
+        self.query_template = query_template
+
+    async def _find(self, school: str) -> List[Tuple[str, Optional[str]]]:
+        query = self.query_template.format(school=school)
+        for depth in self.depths:
+            await self.limiter.wait()
+            response = await self.search(query, depth)
+            contacts: Dict[str, Optional[str]] = {}
+            for email in extract_emails(response.get("answer") or ""):
+                contacts.setdefault(email, None)
+            for result in response.get("results", []):
+                for email in extract_emails(f"{result.get('content') or ''} {result.get('raw_content') or ''}"):
+                    contacts.setdefault(email, result.get("url"))
+            if contacts:
+                return list(contacts.items())
+        return []
+
+    async def _work(self, job: OutreachJob, queue: "asyncio.Queue[str]"):
+        while True:
+            try:
+                school = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                contacts = await self._find(school)
+                await asyncio.to_thread(self.store.mark_searched, school)
+                if contacts:
+                    new = await asyncio.to_thread(self.store.add_contacts, school, contacts, job.id)
+                    job.new_contacts += new
+                    job.duplicates += len(contacts) - new
+                    job.recent.append(f"{school}: {', '.join(email for email, _ in contacts[:3])}")
+                else:
+                    job.without_contacts.append(school)
+            except Exception as e:
+                logger.warning(f"Outreach search failed for {school}: {e}")
+                job.failed.append(school)
+            finally:
+                job.done += 1
+
+    async def run(self, job: OutreachJob) -> OutreachJob:
+        schools = list(dict.fromkeys(school.strip() for school in job.schools if school.strip()))
+        # Schools with contacts from an earlier job aren't searched again
+        job.already_known = await asyncio.to_thread(self.store.already_found, schools)
+        known = set(job.already_known)
+        job.schools = [school for school in schools if school not in known]
+        queue: "asyncio.Queue[str]" = asyncio.Queue()
+        for school in job.schools:
+            queue.put_nowait(school)
+        try:
+            await asyncio.gather(*(self._work(job, queue) for _ in range(min(self.concurrency, queue.qsize()))))
+        finally:
+            job.finished_at = time.time()
+        logger.info(f"Outreach job {job.id} finished: {job.progress()}")
+        return job
+
+    def start(self, schools: Sequence[str], on_done: Optional[Callable[[OutreachJob], Any]] = None) -> OutreachJob:
+        """Run a batch in the background and return its job right away."""
+        job = OutreachJob(schools)
+        job.task = asyncio.create_task(self.run(job), name=f"outreach-{job.id}")
+        if on_done is not None:
+            job.task.add_done_callback(lambda _: on_done(job))
+        return job
@@ -0,0 +1,112 @@
+"""
+Session startup as a dependency graph. Each stage starts as soon as the stages it
+runs after have finished, so independent ones (room connect, memory load, tool
+discovery) overlap. A stage can have its own timeout and a fallback that stands
+in for its result when it fails or runs out of time.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import metrics
+
+logger = logging.getLogger("startup")
+
+
+class StartupGraph:
+    def __init__(self, observe: Callable[[str, float], None] = metrics.observe_phase):
+        """
+        Args:
+            observe: Called with each stage's name and duration once it finishes, fallbacks included.
+        """
+        self.observe = observe
+        self._stages: Dict[str, tuple] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.fell_back: List[str] = []
+
+    def stage(self, name: str, fn: Callable[..., Awaitable[Any]], after: Iterable[str] = (),
+              timeout: Optional[float] = None, fallback: Optional[Callable[[], Any]] = None):
+        """
+        Add a stage that runs `fn(*results of after)`. Stages may only run after ones
+        added before them, which rules out cycles.
+
+        Without a fallback, a stage that fails or outlasts `timeout` fails every stage
+        after it, and `run`; with one, `fallback()` becomes its result.
+        """
+        after = tuple(after)
+        for dep in after:
+            if dep not in self._stages:
+                raise ValueError(f"Startup stage '{name}' runs after unknown stage '{dep}'")
+        if name in self._stages:
+            raise ValueError(f"Duplicate startup stage '{name}'")
+        self._stages[name] = (fn, after, timeout, fallback)
+
+    async def _run_stage(self, name: str) -> Any:
+        fn, after, timeout, fallback = self._stages[name]
+        inputs = [await self._tasks[dep] for dep in after]
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(fn(*inputs), timeout)
+        except Exception as e:
+            if fallback is None:
+                logger.error(f"Startup stage '{name}' failed: {e!r}")
+                raise
+            reason = f"timed out after {timeout}s" if isinstance(e, asyncio.TimeoutError) else f"failed: {e!r}"
+            logger.warning(f"Startup stage '{name}' {reason}, using its fallback")
+            self.fell_back.append(name)
+            return fallback()
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def start(self):
+        """Schedule every stage; idempotent."""
+        for name in self._stages:
+            if name not in self._tasks:
+                self._tasks[name] = asyncio.create_task(self._run_stage(name), name=f"startup-{name}")
+
+    async def result(self, name: str) -> Any:
+        """Wait for one stage, starting the graph if needed."""
+        self.start()
+        return await asyncio.shield(self._tasks[name])
+
+    async def run(self) -> Dict[str, Any]:
+        """Run every stage and return their results by name. On failure the unfinished stages are cancelled."""
+        self.start()
+        try:
+            results = await asyncio.gather(*self._tasks.values())
+        except BaseException:
+            for task in self._tasks.values():
+                task.cancel()
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+            raise
+        return dict(zip(self._tasks, results))
+
+
+def session_graph(stages: Dict[str, Callable[..., Awaitable[Any]]], mem0_client_timeout: float,
+                  memory_timeout: float, memory_fallback: Callable[[], Any], goal_status_timeout: float = 1.0,
+                  observe: Callable[[str, float], None] = metrics.observe_phase) -> StartupGraph:
+    """
+    A session's startup graph: which stage runs after which, and which may fall back. Shared by
+    agent.entrypoint and the benchmark, which only swap in their own stage implementations.
+
+    Args:
+        stages: An implementation for each stage, by name; each gets the results of the stages it runs after.
+        mem0_client_timeout: Deadline for building the mem0 client; the session carries on without it.
+        memory_timeout: Deadline for loading the memory snapshot, past which `memory_fallback()` stands in.
+        memory_fallback: The memory index to run with when the snapshot can't be loaded.
+        goal_status_timeout: Deadline for the outreach status the greeting mentions; it is left out past it.
+        observe: Called with each stage's name and duration once it finishes.
+    """
+    graph = StartupGraph(observe=observe)
+    graph.stage("mem0_client", stages["mem0_client"], timeout=mem0_client_timeout, fallback=lambda: None)
+    graph.stage("journal_upload", stages["journal_upload"], after=["mem0_client"])
+    graph.stage("mem0_load", stages["mem0_load"], timeout=memory_timeout, fallback=memory_fallback)
+    graph.stage("build_agent", stages["build_agent"], after=["mem0_load"])
+    graph.stage("memory_sync", stages["memory_sync"], after=["mem0_client", "build_agent"])
+    graph.stage("mcp_tools_attached", stages["mcp_tools_attached"], after=["build_agent"])
+    graph.stage("session_start", stages["session_start"], after=["build_agent"])
+    graph.stage("ctx_connect", stages["ctx_connect"])
+    graph.stage("goal_status", stages["goal_status"], timeout=goal_status_timeout, fallback=lambda: None)
+    graph.stage("first_reply", stages["first_reply"], after=["session_start", "ctx_connect", "goal_status"])
+    return graph
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# tools.py and load.py read these at import; keep tests off .cache/
+_workdir = tempfile.mkdtemp(prefix="jarvis-tests-")
+os.environ.setdefault("WEATHER_CACHE_PATH", "")
+os.environ.setdefault("SEARCH_CACHE_PATH", "")
+os.environ.setdefault("OUTREACH_DB_PATH", os.path.join(_workdir, "outreach.sqlite3"))
+os.environ.setdefault("WORKER_LOAD_REPORT", os.path.join(_workdir, "worker-load.json"))
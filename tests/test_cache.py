@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+
+from cache import TTLCache
+
+
+def _loader(calls, value, delay=0.02):
+    async def load():
+        calls.append(value)
+        await asyncio.sleep(delay)
+        return value
+    return load
+
+
+def test_concurrent_loads_are_coalesced():
+    async def scenario():
+        cache, calls = TTLCache("coalesce", ttl=60), []
+        values = await asyncio.gather(*(cache.get_or_load("k", _loader(calls, {"v": 1})) for _ in range(5)))
+        return cache, calls, values
+
+    cache, calls, values = asyncio.run(scenario())
+    assert calls == [{"v": 1}]
+    assert values == [{"v": 1}] * 5
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 4, 0)
+
+
+def test_cancelled_owner_does_not_fail_waiters():
+    async def scenario():
+        cache, calls = TTLCache("cancel", ttl=60), []
+        owner = asyncio.create_task(cache.get_or_load("k", _loader(calls, "v", delay=0.05)))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_load("k", _loader(calls, "other")))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        value = await waiter
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return cache, calls, value
+
+    cache, calls, value = asyncio.run(scenario())
+    assert value == "v"
+    assert calls == ["v"]
+    # The load finished despite its first caller going away, so later lookups are hits
+    assert cache.get("k") == "v"
+
+
+def test_failed_load_reaches_every_waiter_and_is_not_a_hit():
+    async def scenario():
+        cache = TTLCache("fail", ttl=60)
+
+        async def boom():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream down")
+
+        results = await asyncio.gather(*(cache.get_or_load("k", boom) for _ in range(3)), return_exceptions=True)
+        return cache, results
+
+    cache, results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+    stats = cache.stats()
+    assert stats["coalesced"] == 0
+    assert stats["load_errors"] == 1
+    assert stats["hit_rate"] == 0.0
+    assert cache.get("k") is None
+
+
+def test_stale_entries_are_served_while_refreshed():
+    async def scenario():
+        cache, calls = TTLCache("stale", ttl=60, stale_ttl=60), []
+        cache.set("k", "old", stored_at=time.time() - 90)
+        served = await cache.get_or_load("k", _loader(calls, "new", delay=0.01))
+        await asyncio.sleep(0.05)
+        return cache, calls, served
+
+    cache, calls, served = asyncio.run(scenario())
+    assert served == "old"
+    assert calls == ["new"]
+    assert cache.get("k") == "new"
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_lru_eviction_by_entry_count():
+    cache = TTLCache("lru", ttl=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,41 @@
+import json
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import health_server
+import load
+
+
+@pytest.fixture
+def client():
+    if os.path.exists(load.LOAD_REPORT_PATH):
+        os.remove(load.LOAD_REPORT_PATH)
+    return TestClient(health_server.create_app())
+
+
+def _write_report(age: float, registered: bool):
+    with open(load.LOAD_REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump({"load": 0.1, "registered": registered, "at": time.time() - age}, f)
+
+
+def test_healthy_while_the_worker_starts(client):
+    assert client.get("/healthz").status_code == 200
+    assert client.get("/readyz").status_code == 503
+
+
+def test_ready_once_registered_with_a_fresh_heartbeat(client):
+    _write_report(age=0, registered=False)
+    assert client.get("/readyz").status_code == 503
+    _write_report(age=0, registered=True)
+    assert client.get("/readyz").json() == {"ready": True, "agent": "Jarvis"}
+
+
+def test_stale_heartbeat_fails_both_checks(client):
+    _write_report(age=health_server.HEARTBEAT_STALE_SECONDS + 5, registered=True)
+    health = client.get("/healthz")
+    assert health.status_code == 503
+    assert health.json()["status"] == "stalled"
+    assert client.get("/readyz").status_code == 503
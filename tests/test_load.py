@@ -0,0 +1,22 @@
+import asyncio
+import gc
+import weakref
+
+import load
+
+
+def test_one_probe_per_loop_and_finished_loops_are_released():
+    loops = []
+
+    async def session():
+        loops.append(weakref.ref(asyncio.get_running_loop()))
+        probe = load.ensure_lag_probe(interval=0.01)
+        assert load.ensure_lag_probe() is probe
+        await asyncio.sleep(0.05)
+        assert asyncio.get_running_loop() in load._loop_lag
+
+    for _ in range(2):
+        asyncio.run(session())
+    gc.collect()
+    assert [ref() for ref in loops] == [None, None]
+    assert len(load._lag_probes) == len(load._loop_lag) == 0
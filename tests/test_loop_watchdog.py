@@ -0,0 +1,38 @@
+import asyncio
+import gc
+import time
+import weakref
+
+import loop_watchdog
+
+
+async def _blocking_session():
+    loop_watchdog.ensure_watchdog(0.05)
+    await asyncio.sleep(0.1)
+    time.sleep(0.2)
+    await asyncio.sleep(0.1)
+    offenders = loop_watchdog.worst_offenders()
+    loop_watchdog.log_worst_offenders()
+    return offenders, loop_watchdog.worst_offenders()
+
+
+def test_offenders_are_per_session():
+    for _ in range(2):
+        offenders, after_log = asyncio.run(_blocking_session())
+        assert [entry["count"] for entry in offenders] == [1]
+        assert "test_loop_watchdog.py" in offenders[0]["site"]
+        assert after_log == []
+
+
+def test_finished_loops_are_not_kept_alive():
+    loops = []
+
+    async def session():
+        loops.append(weakref.ref(asyncio.get_running_loop()))
+        loop_watchdog.ensure_watchdog(0.05)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(session())
+    time.sleep(0.1)
+    gc.collect()
+    assert loops[0]() is None
@@ -0,0 +1,36 @@
+import json
+
+from mcp.types import CallToolResult, TextContent
+
+from mcp_client.util import _truncate_text, decode_call_tool_result
+
+TEXTS = [
+    " ".join(["alpha", "beta", "gamma\n"] * 400),
+    "x" * 5000,
+    json.dumps(list(range(3000))),
+    json.dumps({str(i): "v" * i for i in range(200)}),
+]
+
+
+def test_truncated_text_fits_the_budget_with_its_note():
+    for budget in list(range(1, 120)) + [500, 4000]:
+        for text in TEXTS:
+            assert len(_truncate_text(text, budget)) <= budget
+
+
+def test_truncation_notes_what_was_dropped():
+    assert _truncate_text("word " * 200, 100).endswith("characters]")
+    shrunk = _truncate_text(json.dumps(list(range(300))), 120)
+    assert shrunk.startswith("[0, 1, 2") and shrunk.endswith("more items truncated */")
+
+
+def test_decoded_results_fit_the_cap():
+    for cap in (40, 100, 333, 4000):
+        for is_error in (False, True):
+            result = CallToolResult(content=[TextContent(type="text", text=t) for t in TEXTS], isError=is_error)
+            assert len(decode_call_tool_result(result, cap)) <= cap
+
+
+def test_short_results_are_untouched():
+    result = CallToolResult(content=[TextContent(type="text", text="sent to a@b.c")])
+    assert decode_call_tool_result(result, 4000) == "sent to a@b.c"
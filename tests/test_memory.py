@@ -0,0 +1,49 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from memory import MemoryIndex, estimate_tokens
+
+
+def _record(i, text, days_old=1.0):
+    updated = datetime.now(timezone.utc) - timedelta(days=days_old)
+    return {"id": f"m{i}", "memory": text, "updated_at": updated.isoformat()}
+
+
+RECORDS = [
+    _record(0, "Ivan is emailing 100 schools about the robotics outreach program"),
+    _record(1, "Ivan likes Linkin Park"),
+    _record(2, "The outreach email list lives in a shared spreadsheet", days_old=40),
+    _record(3, "Ivan's favourite city is Lisbon"),
+]
+
+
+def test_select_ranks_relevant_memories_first():
+    selected = MemoryIndex(RECORDS).select("outreach email schools", k=2)
+    assert [m["id"] for m in selected] == ["m0", "m2"]
+
+
+def test_select_respects_k_and_exclusions():
+    index = MemoryIndex(RECORDS)
+    assert len(index.select("", k=3)) == 3
+    selected = index.select("outreach email schools", k=2, exclude_ids={"m0"})
+    assert "m0" not in [m["id"] for m in selected]
+    assert selected[0]["id"] == "m2"
+
+
+def test_select_stays_within_the_token_budget():
+    text = "outreach " * 40
+    cost = estimate_tokens(json.dumps(text))
+    index = MemoryIndex([_record(i, text) for i in range(5)])
+    assert len(index.select("outreach", k=5, token_budget=2 * cost + 1)) == 2
+    assert index.select("outreach", k=5, token_budget=cost - 1) == []
+
+
+def test_recent_memories_win_without_a_query():
+    selected = MemoryIndex(RECORDS).select("", k=4)
+    assert selected[-1]["id"] == "m2"
+
+
+def test_recall_formats_the_selection():
+    index = MemoryIndex(RECORDS)
+    assert json.loads(index.recall("Linkin Park", k=1)) == ["Ivan likes Linkin Park"]
+    assert MemoryIndex([]).recall("anything") == "Nothing relevant in the vault."
@@ -0,0 +1,54 @@
+import pytest
+
+from outreach import OutreachStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = OutreachStore(str(tmp_path / "outreach.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_record_send_counts_schools_toward_the_goal(store):
+    store.add_contacts("Green Valley High", [("office@greenvalley.edu", "https://greenvalley.edu/contact"),
+                                             ("head@greenvalley.edu", None)])
+    assert store.record_send(["Office@GreenValley.edu", "not-an-address"], subject="Partnership") == 1
+
+    status = store.goal_status(goal=100)
+    assert status["schools_emailed"] == 1
+    assert status["schools_emailed_this_week"] == 1
+    assert status["remaining"] == 99
+    assert status["contacts_known"] == 2
+    assert status["contacts_not_yet_emailed"] == 1
+    assert status["hours_since_last_email"] == 0.0
+
+
+def test_a_school_counts_once_however_many_addresses_are_emailed(store):
+    store.add_contacts("Lake Academy", [("a@lake.edu", None), ("b@lake.edu", None)])
+    store.record_send(["a@lake.edu"])
+    store.record_send(["b@lake.edu", "a@lake.edu"])
+    assert store.goal_status(goal=2)["schools_emailed"] == 1
+    assert store.lookup("a@lake.edu")["send_count"] == 2
+
+
+def test_unknown_addresses_are_filed_under_their_domain(store):
+    store.record_send(["principal@hillcollege.edu"])
+    status = store.goal_status(goal=10)
+    assert (status["schools_known"], status["schools_emailed"]) == (1, 1)
+    assert store.lookup("principal@hillcollege.edu")["school"] == "hillcollege.edu"
+
+
+def test_failed_sends_do_not_count(store):
+    store.add_contacts("Royal Primary", [("info@royal.edu", None)])
+    store.record_send(["info@royal.edu"], ok=False)
+    status = store.goal_status(goal=10)
+    assert status["schools_emailed"] == 0
+    assert status["hours_since_last_email"] is None
+    assert store.lookup("info@royal.edu")["status"] == "failed"
+
+
+def test_goal_status_of_an_empty_store(store):
+    status = store.goal_status(goal=100)
+    assert status["schools_emailed"] == 0
+    assert status["remaining"] == 100
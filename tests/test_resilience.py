@@ -0,0 +1,79 @@
+import pytest
+
+from mcp_client import resilience
+from mcp_client.resilience import CircuitBreaker, CircuitOpenError
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("srv", failure_threshold=3, recovery_timeout=30)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure(RuntimeError("boom"))
+    assert breaker.state == "closed"
+    breaker.before_call()
+    breaker.record_failure(RuntimeError("boom"))
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError, match="boom"):
+        breaker.before_call()
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("srv", failure_threshold=2)
+    breaker.record_failure(RuntimeError("boom"))
+    breaker.record_success()
+    breaker.record_failure(RuntimeError("boom"))
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_a_single_probe_through(clock):
+    breaker = CircuitBreaker("srv", failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure(RuntimeError("boom"))
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now += 2
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError, match="probe in progress"):
+        breaker.before_call()
+
+
+def test_probe_outcome_closes_or_reopens(clock):
+    breaker = CircuitBreaker("srv", failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure(RuntimeError("boom"))
+    clock.now += 31
+    breaker.before_call()
+    breaker.record_failure(RuntimeError("still down"))
+    assert breaker.state == "open"
+    assert breaker.opened_at == clock.now
+
+    clock.now += 31
+    breaker.before_call()
+    breaker.record_success()
+    assert (breaker.state, breaker.failures) == ("closed", 0)
+    breaker.before_call()
+
+
+def test_released_probe_frees_the_half_open_slot(clock):
+    breaker = CircuitBreaker("srv", failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure(RuntimeError("boom"))
+    clock.now += 31
+    breaker.before_call()
+    breaker.release_probe()
+    breaker.before_call()
+    assert breaker.state == "half_open"
@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import tools
+from outreach import OutreachJob
+
+
+def _result(title, url, content, score):
+    return {"title": title, "url": url, "content": content, "score": score}
+
+
+def test_condense_prefers_the_direct_answer():
+    condensed = tools._condense({"answer": "It is sunny. " * 100, "results": []}, 200)
+    assert condensed.startswith("DIRECT SEARCH ANSWER: It is sunny.")
+    assert len(condensed) <= 200
+
+
+def test_condense_shares_the_budget_best_result_first():
+    response = {"results": [
+        _result("Low", "https://low.example", "Less relevant. " * 40, 0.2),
+        _result("High", "https://high.example", "Most relevant. " * 40, 0.9),
+    ]}
+    condensed = tools._condense(response, 700)
+    lines = condensed.split("\n")
+    assert [line.split(":")[0] for line in lines] == ["- High", "- Low"]
+    assert lines[0].endswith("(https://high.example)")
+    assert len(condensed) <= 700
+
+
+def test_condense_survives_long_titles_and_urls():
+    response = {"results": [
+        _result("T" * 400, "https://example.com/" + "a" * 600, "The useful part. " * 40, 0.9),
+        _result("Short", "https://short.example", "More detail here. " * 40, 0.5),
+    ]}
+    condensed = tools._condense(response, 700)
+    assert "The useful part." in condensed
+    assert "More detail here." in condensed
+    assert "a" * 600 not in condensed
+    assert len(condensed) <= 700
+
+
+def test_condense_keeps_one_snippet_on_a_tight_budget():
+    response = {"results": [_result(f"Result {i}", f"https://r{i}.example", "Some text. " * 20, 1 - i / 10)
+                            for i in range(5)]}
+    condensed = tools._condense(response, 150)
+    assert condensed.startswith("- Result 0: Some text.")
+    assert len(condensed) <= 150
+
+
+def test_condense_without_results():
+    assert tools._condense({"results": []}, 700) == "No relevant info found."
+
+
+class _Session:
+    def generate_reply(self, **kwargs):
+        pass
+
+
+class _Context:
+    def __init__(self):
+        self.session = _Session()
+
+
+class _Pipeline:
+    def start(self, schools, on_done=None):
+        return OutreachJob(schools)
+
+
+def test_outreach_progress_reports_the_sessions_own_latest_job(monkeypatch):
+    monkeypatch.setattr(tools, "_outreach_pipeline", _Pipeline())
+    monkeypatch.setattr(tools, "_outreach_jobs", {})
+    find, progress = tools.find_school_contacts._func, tools.outreach_progress._func
+    mine, theirs = _Context(), _Context()
+
+    async def scenario():
+        await find(mine, ["Green Valley High"])
+        await find(theirs, ["Lake Academy", "Royal Primary"])
+        return json.loads(await progress(mine)), await progress(_Context())
+
+    own, fresh = asyncio.run(scenario())
+    assert own["schools_total"] == 1
+    assert fresh == "No outreach jobs yet."
+
+
+def test_finished_outreach_jobs_are_forgotten(monkeypatch):
+    monkeypatch.setattr(tools, "_outreach_pipeline", _Pipeline())
+    monkeypatch.setattr(tools, "_outreach_jobs", {})
+    context = _Context()
+    asyncio.run(tools.find_school_contacts._func(context, ["Hill College"]))
+    job = next(iter(tools._outreach_jobs.values()))
+    job.finished_at = job.started_at - tools.OUTREACH_JOB_TTL - 1
+    assert asyncio.run(tools.outreach_progress._func(context, job.id)) == f"No outreach job {job.id}."
+    assert tools._outreach_jobs == {}
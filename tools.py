@@ -1,35 +1,298 @@
 import logging
 import os
-import requests
+import json
 import asyncio
+import re
+import time
+import weakref
+from urllib.parse import quote
 from livekit.agents import function_tool, RunContext
-from tavily import TavilyClient
-from typing import Optional
+from typing import Dict, List, Optional
 
-tavily = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+import http_client
+import metrics
+from cache import TTLCache
+from outreach import OutreachJob, OutreachPipeline, OutreachStore
+
+# Overridable so benchmarks can point the tools at local stand-ins
+TAVILY_SEARCH_URL = os.environ.get("TAVILY_SEARCH_URL", "https://api.tavily.com/search")
+WTTR_URL = os.environ.get("WTTR_URL", "https://wttr.in")
+# Per-call deadlines, so a slow upstream can't hold the voice turn indefinitely
+SEARCH_TIMEOUT = float(os.environ.get("SEARCH_TIMEOUT", 8))
+WEATHER_TIMEOUT = float(os.environ.get("WEATHER_TIMEOUT", 5))
+
+# Weather changes slowly; past WEATHER_CACHE_TTL an entry is still served instantly
+# for WEATHER_CACHE_STALE_TTL while a background request refreshes it. Entries are kept in
+# WEATHER_CACHE_PATH too, so they outlive the room's job process (set it empty to keep them in memory)
+WEATHER_CACHE = TTLCache(
+    "get_weather",
+    ttl=float(os.environ.get("WEATHER_CACHE_TTL", 15 * 60)),
+    stale_ttl=float(os.environ.get("WEATHER_CACHE_STALE_TTL", 6 * 3600)),
+    max_entries=256,
+    disk_path=os.environ.get("WEATHER_CACHE_PATH", ".cache/weather-cache.sqlite3"),
+)
+
+class _WeatherUnavailable(Exception):
+    pass
+
+def _weather_cache_key(city: str) -> str:
+    """
+    "New York, NY" and " new york,ny " share one entry. The region stays in the key, so
+    "Portland, OR" and "Portland, ME" don't, nor do "Paris, TX" and "Paris".
+    """
+    parts = [" ".join(part.split()) for part in city.lower().split(",")]
+    return ", ".join(part for part in parts if part)
+
+async def _fetch_weather(city: str) -> str:
+    status, text = await http_client.get_text(
+        f"{WTTR_URL}/{quote(city)}?format=%C+%t+with+wind+at+%w", timeout=WEATHER_TIMEOUT
+    )
+    if status != 200:
+        raise _WeatherUnavailable(f"wttr.in returned HTTP {status}")
+    return text.strip()
+
+# Shared across rooms in this process, and through the SQLite file at SEARCH_CACHE_PATH across
+# job processes and restarts (set it empty to keep results in memory only)
+SEARCH_CACHE = TTLCache(
+    "search_web",
+    ttl=float(os.environ.get("SEARCH_CACHE_TTL", 6 * 3600)),
+    max_entries=int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", 1024)),
+    max_bytes=int(os.environ.get("SEARCH_CACHE_MAX_BYTES", 16 * 1024 * 1024)),
+    disk_path=os.environ.get("SEARCH_CACHE_PATH", ".cache/search-cache.sqlite3"),
+)
+
+# Searches start with Tavily's fast basic depth and escalate to advanced only when basic has no
+# direct answer or its best result scores below SEARCH_MIN_SCORE. What goes back to the model is
+# condensed to SEARCH_RESULT_CHARS characters.
+SEARCH_MAX_RESULTS = int(os.environ.get("SEARCH_MAX_RESULTS", 3))
+SEARCH_MIN_SCORE = float(os.environ.get("SEARCH_MIN_SCORE", 0.5))
+SEARCH_RESULT_CHARS = int(os.environ.get("SEARCH_RESULT_CHARS", 700))
+# An escalation that takes longer than this is answered from the basic results; the advanced
+# search still completes in the background and is cached for the next time
+SEARCH_ESCALATION_TIMEOUT = float(os.environ.get("SEARCH_ESCALATION_TIMEOUT", 2.5))
+
+_SENTENCE_END = re.compile(r"[.!?](?=\s)")
+_MIN_RESULT_CHARS = 120
+_escalations = set()
+
+def _search_cache_key(query: str, **params) -> str:
+    """Case, whitespace and trailing punctuation don't change the answer, so they don't change the key."""
+    normalized = " ".join(query.lower().split()).rstrip("?!. ")
+    return json.dumps([normalized, sorted(params.items())])
+
+async def _tavily_search(query: str, **params) -> dict:
+    """Runs a Tavily search over the shared async HTTP pool."""
+    headers = {"Authorization": f"Bearer {os.getenv('TAVILY_API_KEY')}"}
+    status, response = await http_client.post_json(
+        TAVILY_SEARCH_URL, {"query": query, **params}, timeout=SEARCH_TIMEOUT, headers=headers
+    )
+    if status != 200:
+        detail = response.get("detail") if isinstance(response, dict) else None
+        raise RuntimeError(f"Tavily returned HTTP {status}" + (f": {detail}" if detail else ""))
+    return response
+
+async def _cached_search(query: str, depth: str) -> dict:
+    params = {"search_depth": depth, "max_results": SEARCH_MAX_RESULTS, "include_answer": True}
+    return await SEARCH_CACHE.get_or_load(_search_cache_key(query, **params), lambda: _tavily_search(query, **params))
+
+def _escalation_done(task: asyncio.Task):
+    _escalations.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logging.warning(f"Advanced search failed: {task.exception()}")
+
+def _confident(response: dict) -> bool:
+    scores = [res.get("score") or 0 for res in response.get("results", [])]
+    return bool(response.get("answer")) and max(scores, default=0) >= SEARCH_MIN_SCORE
+
+def _clip(text: str, limit: int) -> str:
+    """At most `limit` characters, cut after a sentence if one ends late enough, else between words."""
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    ends = [m.end() for m in _SENTENCE_END.finditer(cut + " ")]
+    if ends and ends[-1] >= limit // 2:
+        return cut[:ends[-1]]
+    return text[:limit - 3].rsplit(" ", 1)[0].rstrip(",;:") + "..."
+
+def _condense(response: dict, budget: int) -> str:
+    """The direct answer, or the best results' snippets shared out over `budget` characters."""
+    if response.get("answer"):
+        prefix = "DIRECT SEARCH ANSWER: "
+        return prefix + _clip(response["answer"], budget - len(prefix))
+    results = sorted(response.get("results", []), key=lambda res: res.get("score") or 0, reverse=True)
+    # Only as many results as can each get a useful share, so the best ones aren't starved
+    results = results[:max(1, budget // _MIN_RESULT_CHARS)]
+    lines = []
+    for i, res in enumerate(results):
+        remaining = budget - sum(len(line) + 1 for line in lines)
+        share = remaining // (len(results) - i)
+        # A long title is clipped and a long URL left out, so neither can crowd out the snippet
+        head = f"- {_clip(res.get('title') or '', share // 4)}: "
+        url = res.get("url") or ""
+        tail = f" ({url})" if len(url) + 3 <= share // 3 else ""
+        room = share - len(head) - len(tail)
+        if room < 40 and (lines or i + 1 < len(results)):
+            # Its share goes to the results after it; the last one is kept if nothing else was
+            continue
+        lines.append(f"{head}{_clip(res.get('content') or '', max(room, 10))}{tail}")
+    return "\n".join(lines) if lines else "No relevant info found."
 
 @function_tool()
+@metrics.timed_tool
 async def search_web(context: RunContext, query: str) -> str:
     """CRITICAL: Use for factual queries or recent events."""
     try:
-        response = tavily.search(query=query, search_depth="advanced", max_results=3, include_answer=True)
-        if response.get("answer"): return f"DIRECT SEARCH ANSWER: {response['answer']}"
-        results = [f"- {res['title']}: {res['content']} ({res['url']})" for res in response.get("results", [])]
-        return "\n".join(results) if results else "No relevant info found."
+        response = await _cached_search(query, "basic")
+        tier = "basic"
+        if not _confident(response):
+            escalation = asyncio.create_task(_cached_search(query, "advanced"))
+            _escalations.add(escalation)
+            escalation.add_done_callback(_escalation_done)
+            try:
+                response = await asyncio.wait_for(asyncio.shield(escalation), SEARCH_ESCALATION_TIMEOUT)
+                tier = "advanced"
+            except asyncio.TimeoutError:
+                tier = "advanced_timeout"
+            except Exception:
+                # The basic results are still better than an error; the failure is logged once it's collected
+                tier = "advanced_failed"
+        metrics.SEARCH_TIERS.labels(tier).inc()
+        return _condense(response, SEARCH_RESULT_CHARS)
     except Exception as e:
         return f"Search error: {str(e)}"
 
+# Batch contact search for the school outreach goal: OUTREACH_CONCURRENCY schools at a time, at most
+# OUTREACH_RATE searches per second, up to OUTREACH_MAX_SCHOOLS per job; contacts go to OUTREACH_DB_PATH
+OUTREACH_DB_PATH = os.environ.get("OUTREACH_DB_PATH", ".cache/outreach.sqlite3")
+OUTREACH_CONCURRENCY = int(os.environ.get("OUTREACH_CONCURRENCY", 4))
+OUTREACH_RATE = float(os.environ.get("OUTREACH_RATE", 3))
+OUTREACH_MAX_SCHOOLS = int(os.environ.get("OUTREACH_MAX_SCHOOLS", 100))
+# Schools to have emailed; sends are recorded from the MCP email tool (see agent.py)
+OUTREACH_GOAL = int(os.environ.get("OUTREACH_GOAL", 100))
+# Finished jobs can be asked about for this long before they are forgotten
+OUTREACH_JOB_TTL = float(os.environ.get("OUTREACH_JOB_TTL", 3600))
+
+_outreach_store: Optional[OutreachStore] = None
+_outreach_pipeline: Optional[OutreachPipeline] = None
+_outreach_jobs: Dict[str, OutreachJob] = {}
+# Each session's job ids, newest last; jobs of every session in the process share _outreach_jobs
+_session_jobs: "weakref.WeakKeyDictionary[object, List[str]]" = weakref.WeakKeyDictionary()
+
+def outreach_store() -> OutreachStore:
+    """The worker's outreach store, opened on first use."""
+    global _outreach_store
+    if _outreach_store is None:
+        _outreach_store = OutreachStore(OUTREACH_DB_PATH)
+    return _outreach_store
+
+def _outreach() -> OutreachPipeline:
+    global _outreach_pipeline
+    if _outreach_pipeline is None:
+        _outreach_pipeline = OutreachPipeline(
+            _cached_search, outreach_store(), concurrency=OUTREACH_CONCURRENCY, rate=OUTREACH_RATE
+        )
+    return _outreach_pipeline
+
+def _prune_outreach_jobs():
+    cutoff = time.time() - OUTREACH_JOB_TTL
+    for job_id, job in list(_outreach_jobs.items()):
+        if job.finished_at is not None and job.finished_at < cutoff:
+            _outreach_jobs.pop(job_id, None)
+    for job_ids in list(_session_jobs.values()):
+        job_ids[:] = [job_id for job_id in job_ids if job_id in _outreach_jobs]
+
 @function_tool()
+@metrics.timed_tool
+async def find_school_contacts(context: RunContext, schools: list[str]) -> str:
+    """Find contact emails for a whole list of schools in one background job and add them to the outreach list.
+    Returns a job id at once; check on it with outreach_progress. Ivan is told when the job finishes."""
+    try:
+        if not schools:
+            return "No schools given."
+        def announce(job: OutreachJob):
+            progress = job.progress()
+            try:
+                context.session.generate_reply(instructions=(
+                    f"Briefly tell Ivan the school contact search finished: {progress['new_contacts']} new contacts "
+                    f"from {progress['schools_done']} schools, {len(job.without_contacts)} without any listed email."
+                ))
+            except Exception as e:
+                logging.info(f"Outreach job {job.id} finished after the session ended: {e}")
+
+        _prune_outreach_jobs()
+        job = _outreach().start(schools[:OUTREACH_MAX_SCHOOLS], on_done=announce)
+        _outreach_jobs[job.id] = job
+        _session_jobs.setdefault(context.session, []).append(job.id)
+        skipped = len(schools) - OUTREACH_MAX_SCHOOLS
+        return (f"Outreach job {job.id} started for {min(len(schools), OUTREACH_MAX_SCHOOLS)} schools."
+                + (f" {skipped} schools were over the per-job limit; send them as another job." if skipped > 0 else ""))
+    except Exception as e:
+        return f"Outreach job failed to start: {e}"
+
+@function_tool()
+@metrics.timed_tool
+async def outreach_progress(context: RunContext, job_id: str = "") -> str:
+    """Progress of a school contact search job; the latest job of this conversation when no id is given."""
+    _prune_outreach_jobs()
+    if not job_id:
+        # Other sessions' jobs share the process (thread executor); only this one's are "the latest"
+        job_ids = _session_jobs.get(context.session) or [""]
+        job_id = job_ids[-1]
+    job = _outreach_jobs.get(job_id)
+    if job is None:
+        return f"No outreach job {job_id}." if job_id else "No outreach jobs yet."
+    return json.dumps(job.progress())
+
+@function_tool()
+@metrics.timed_tool
+async def outreach_goal_status(context: RunContext) -> str:
+    """Progress toward the 100-school goal: schools emailed, emailed this week, contacts not yet emailed."""
+    try:
+        return json.dumps(await asyncio.to_thread(outreach_store().goal_status, OUTREACH_GOAL))
+    except Exception as e:
+        return f"Outreach store error: {e}"
+
+@function_tool()
+@metrics.timed_tool
+async def recently_contacted(context: RunContext, days: int = 7) -> str:
+    """Who was emailed in the last `days` days, most recent first."""
+    try:
+        rows = await asyncio.to_thread(outreach_store().contacted_since, time.time() - days * 86400)
+        if not rows:
+            return f"Nobody was emailed in the last {days} days."
+        return "\n".join(
+            f"- {row['email']} ({row['school']}), {time.strftime('%a %d %b', time.localtime(row['last_sent_at']))}"
+            + (f": {row['last_subject']}" if row["last_subject"] else "")
+            for row in rows
+        )
+    except Exception as e:
+        return f"Outreach store error: {e}"
+
+@function_tool()
+@metrics.timed_tool
+async def check_outreach(context: RunContext, email_or_school: str) -> str:
+    """Before adding or emailing a contact: do we already have this address or school, and was it emailed?"""
+    try:
+        found = await asyncio.to_thread(outreach_store().lookup, email_or_school)
+        return json.dumps(found) if found else f"{email_or_school} is new: not in the outreach list."
+    except Exception as e:
+        return f"Outreach store error: {e}"
+
+@function_tool()
+@metrics.timed_tool
 async def get_weather(context: RunContext, city: str) -> str:
     """Get the current weather."""
     try:
-        # 5s timeout to prevent hanging
-        response = requests.get(f"https://wttr.in/{city}?format=%C+%t+with+wind+at+%w", timeout=5)
-        return f"Weather in {city}: {response.text.strip()}" if response.status_code == 200 else "Weather data unavailable."
+        report = await WEATHER_CACHE.get_or_load(_weather_cache_key(city), lambda: _fetch_weather(city))
+        return f"Weather in {city}: {report}"
+    except _WeatherUnavailable:
+        return "Weather data unavailable."
     except Exception as e:
         return f"Weather error: {str(e)}"
 
 @function_tool()
+@metrics.timed_tool
 async def mobile_whatsapp(context: RunContext, phone_number: str, message: str) -> str:
     """Triggers mobile to open WhatsApp. phone_number must include country code."""
     try:
@@ -41,6 +304,7 @@ async def mobile_whatsapp(context: RunContext, phone_number: str, message: str)
         return f"WhatsApp Handshake failed: {e}"
 
 @function_tool()
+@metrics.timed_tool
 async def mobile_discord(context: RunContext, message: str) -> str:
     """Triggers mobile to open Discord."""
     try:
@@ -49,3 +313,10 @@ async def mobile_discord(context: RunContext, message: str) -> str:
         return "Initiating Discord uplink, sir."
     except Exception as e:
         return f"Discord Handshake failed: {e}"
+
+# Every tool the assistant starts a session with; MCP tools are attached during the session and
+# recall_memories belongs to the agent, which holds the memory index
+ASSISTANT_TOOLS = [
+    get_weather, search_web, mobile_whatsapp, mobile_discord, find_school_contacts, outreach_progress,
+    outreach_goal_status, recently_contacted, check_outreach,
+]